@@ -11,7 +11,8 @@ v4 REST APIs. Further details on these libraries and APIs can be found here:
 """
 from datasheets import exceptions
 from datasheets.client import Client
-from datasheets.convenience import create_tab_in_new_workbook, create_tab_in_existing_workbook
+from datasheets.convenience import (create_tab_in_new_workbook, create_tab_in_existing_workbook,
+                                    set_default_client)
 from datasheets.helpers import convert_cell_index_to_label, convert_cell_label_to_index
 from datasheets.tab import Tab
 from datasheets.workbook import Workbook
@@ -26,6 +27,7 @@ __all__ = (
     'create_tab_in_existing_workbook',
     'create_tab_in_new_workbook',
     'exceptions',
+    'set_default_client',
 )
 
 __version__ = '0.3.0'
@@ -1,8 +1,13 @@
+import collections
+import datetime as dt
 import json
 import os
-import types
+import threading
+import time
 
 import apiclient
+import google_auth_httplib2
+import httplib2
 import pandas as pd
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
@@ -12,7 +17,133 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from datasheets import exceptions, helpers
 from datasheets.workbook import Workbook
 
+# Discovery documents for the Drive and Sheets APIs are bundled with the package so that building
+# the API services doesn't require fetching them over the network
+_DISCOVERY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'discovery')
+
+# Treat tokens as expired slightly early so they don't lapse partway through a user action
+_TOKEN_EXPIRY_MARGIN = dt.timedelta(seconds=60)
+_ITEM_INFO_COLUMNS = ['name', 'id', 'modifiedTime', 'webViewLink']
+# How long (in seconds) a filename's looked-up file_id is reused, and how many are remembered
+_FILE_ID_CACHE_TTL = 60
+_FILE_ID_CACHE_SIZE = 128
+# Expanded versions of the credential-related paths, keyed on the unexpanded path
+_resolved_paths = {}
+# Service account credentials, keyed on the key file's path and modification time
+_service_credentials = {}
+# Parsed discovery documents, keyed on (api, version)
+_discovery_docs = {}
+
+
+def _resolve_path(env_var, default):
+    """Return the expanded path stored in the given environment variable, or the default path
+
+    The environment variable is looked up on each call so that it may be changed at any time, but
+    each distinct path is only expanded once.
+
+    Args:
+        env_var (str): The environment variable that may hold the path
+        default (str): The path to use if the environment variable isn't set
+
+    Returns:
+        str: The path with any '~' expanded to the user's home directory
+    """
+    unexpanded_path = os.environ.get(env_var, default)
+    if unexpanded_path not in _resolved_paths:
+        _resolved_paths[unexpanded_path] = os.path.expanduser(unexpanded_path)
+    return _resolved_paths[unexpanded_path]
+
+
+def _load_discovery_doc(api, version):
+    """Load the discovery document bundled with datasheets for an API, parsing it only once
+
+    Parsing a discovery document takes far longer than building a service from the parsed
+    document, so the parsed document is kept and reused by every Client. Building a service only
+    ever adds the same default parameters to the document, so it is safe to share.
+
+    Args:
+        api (str): The name of the API, e.g. 'drive'
+        version (str): The version of the API, e.g. 'v3'
+
+    Returns:
+        dict: The parsed discovery document
+    """
+    key = (api, version)
+    if key not in _discovery_docs:
+        path = os.path.join(_DISCOVERY_DIR, '{}.{}.json'.format(api, version))
+        with open(path) as f:
+            _discovery_docs[key] = json.load(f)
+    return _discovery_docs[key]
+
+
+def _load_service_credentials(service_key_path):
+    """Return service account credentials built from the key file at the given path
+
+    Parsing the key file's RSA private key is relatively expensive, so the credentials are
+    built once per key file and shared by all clients using it. Editing or replacing the key
+    file changes its modification time, causing the credentials to be rebuilt.
+
+    Args:
+        service_key_path (str): The path to the service account's JSON key file
+
+    Returns:
+        google.oauth2.service_account.Credentials: instance of service credentials
+    """
+    cache_key = (service_key_path, os.path.getmtime(service_key_path))
+    if cache_key not in _service_credentials:
+        with open(service_key_path) as f:
+            keyfile_dict = json.load(f)
+        _service_credentials[cache_key] = service_account.Credentials.from_service_account_info(
+            keyfile_dict,
+            scopes=['https://www.googleapis.com/auth/drive']
+        )
+    return _service_credentials[cache_key]
+
+
+def _make_info_frame(raw_info):
+    """Convert file info from Drive into a DataFrame with one row per file
+
+    The info is transposed into one list per column before the DataFrame is built, which is
+    considerably cheaper for pandas than constructing it from a list of dicts.
+
+    Args:
+        raw_info (list): A list of dicts, one per file, as returned by files.list
+
+    Returns:
+        pandas.DataFrame: One row per file with the columns in _ITEM_INFO_COLUMNS
+    """
+    columns = {col: [item.get(col) for item in raw_info] for col in _ITEM_INFO_COLUMNS}
+    return pd.DataFrame(columns, columns=_ITEM_INFO_COLUMNS)
+
+
+class _ThreadLocalHttp(object):
+    """An httplib2-compatible transport that gives each thread its own connections
 
+    httplib2.Http is not thread-safe, so a single instance shared across threads could interleave
+    requests on one socket. This object looks like a single transport to googleapiclient but
+    lazily creates a separate transport (via ``factory``) for each thread that uses it.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+
+    @property
+    def _http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = self._factory()
+        return http
+
+    @property
+    def credentials(self):
+        """ Property for the credentials used to authorize requests (read by googleapiclient) """
+        return self._http.credentials
+
+    def request(self, *args, **kwargs):
+        return self._http.request(*args, **kwargs)
+
+
+@helpers._refresh_token_on_public_calls
 class Client(object):
     def __init__(self, service=False, storage=True, user_agent='Python datasheets library'):
         """Create an authenticated client for interacting with Google Drive and Google Sheets
@@ -48,47 +179,102 @@ class Client(object):
         self.is_service = service
         self.use_storage = storage
         self.user_agent = user_agent
+        # Before each user-facing method call the access token is verified and refreshed if it
+        # has expired. Until this time is reached the token is known to be valid, so the check
+        # can be skipped entirely
+        self._token_valid_until = None
+        # Recently looked-up file_ids, keyed on (kind, filename), so that repeatedly referring to
+        # the same workbook or folder by name doesn't require a Drive query each time
+        self._file_id_cache = collections.OrderedDict()
 
         self._authenticate()
-        self.drive_svc = apiclient.discovery.build('drive', 'v3', credentials=self.credentials)
-        # Bind sheets_svc directly to .spreadsheets() as the API exposes no other functionality
-        self.sheets_svc = apiclient.discovery.build('sheets', 'v4', credentials=self.credentials).spreadsheets()
+        # Share a single authorized transport between both services so that open keep-alive
+        # connections (and their TLS sessions) are reused across Drive and Sheets calls. Each
+        # thread gets its own connections as httplib2 is not thread-safe.
+        self._http = _ThreadLocalHttp(self._build_http)
 
         self._refresh_token_if_needed()
 
-    def __getattribute__(self, attr):
-        """Get an attribute (variable or method) of this instance of this class
-
-        For client OAuth, before each user-facing method call this method will verify that the
-        access token is not expired and refresh it if it is.
-
-        We only refresh on user-facing method calls since otherwise we'd be refreshing multiple
-        times per user action (once for the user call, possibly multiple times for the private
-        method calls invoked by it).
-        """
-        requested_attr = super(Client, self).__getattribute__(attr)
-
-        if isinstance(requested_attr, types.MethodType) \
-           and not attr.startswith('_'):
-            self._refresh_token_if_needed()
-
-        return requested_attr
-
     def __repr__(self):
         msg = "<{module}.{name}(email='{email}')>"
         return msg.format(module=self.__class__.__module__,
                           name=self.__class__.__name__,
                           email=self.email)
 
+    @helpers._cached_property
+    def drive_svc(self):
+        """ Property for the Google Drive service, which is built the first time it is used """
+        return self._build_service('drive', 'v3')
+
+    @helpers._cached_property
+    def sheets_svc(self):
+        """ Property for the Google Sheets service, which is built the first time it is used """
+        # Bind sheets_svc directly to .spreadsheets() as the API exposes no other functionality
+        return self._build_service('sheets', 'v4').spreadsheets()
+
+    @helpers._cached_property
+    def _root_file_id(self):
+        """ The file ID of the user's root Drive folder, which never changes, fetched once """
+        return self.drive_svc.files().get(fileId='root', fields='id').execute()['id']
+
     def _authenticate(self):
         if self.is_service:
             self.credentials = self._get_service_credentials()
         else:
             self.credentials = self._retrieve_client_credentials()
 
+    def _build_http(self):
+        """Create an authorized HTTP transport for the Google API discovery services
+
+        googleapiclient requires an httplib2-compatible transport, so rather than letting each
+        service build its own we create one here. httplib2.Http keeps connections alive per host,
+        so every request made through the returned object skips the TCP and TLS handshakes once
+        the first request to that host has been made.
+
+        Returns:
+            google_auth_httplib2.AuthorizedHttp: An HTTP transport that signs requests with
+            this instance's credentials
+        """
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+
+    def _build_service(self, api, version):
+        """Build a Google API service from its discovery document bundled with datasheets
+
+        apiclient.discovery.build() may download the discovery document describing the API on
+        every call, i.e. two blocking HTTPS requests per Client instantiation before any real
+        work is done. Reading the bundled copy from disk instead makes instantiation near-instant.
+
+        Args:
+            api (str): The name of the API, e.g. 'drive'
+            version (str): The version of the API, e.g. 'v3'
+
+        Returns:
+            googleapiclient.discovery.Resource: The service, using this instance's transport
+        """
+        return apiclient.discovery.build_from_document(_load_discovery_doc(api, version),
+                                                       http=self._http)
+
     def _refresh_token_if_needed(self):
-        if not self.is_service or self.credentials.expired:
+        """Refresh the user access token if it has expired or is about to
+
+        The token is refreshed once it is within ``_TOKEN_EXPIRY_MARGIN`` of expiring so that it
+        can't lapse partway through a multi-request operation such as paginating through Drive
+        results. Service account credentials are skipped entirely as the authorized transport
+        refreshes them itself whenever they are no longer valid.
+        """
+        if self.is_service:
+            return
+
+        now = dt.datetime.utcnow()
+        if self._token_valid_until is not None and now < self._token_valid_until:
+            return
+
+        expiry = self.credentials.expiry
+        if expiry is None or now >= expiry - _TOKEN_EXPIRY_MARGIN:
             self.credentials.refresh(Request())
+            expiry = self.credentials.expiry
+
+        self._token_valid_until = expiry - _TOKEN_EXPIRY_MARGIN if expiry else None
 
     def _retrieve_client_credentials(self):
         """Get valid user credentials
@@ -105,9 +291,8 @@ class Client(object):
         in multi-user environments.
         """
         if self.use_storage:
-            unexpanded_credential_path = os.environ.get('DATASHEETS_CREDENTIALS_PATH',
-                                                        '~/.datasheets/client_credentials.json')
-            credential_path = os.path.expanduser(unexpanded_credential_path)
+            credential_path = _resolve_path('DATASHEETS_CREDENTIALS_PATH',
+                                            '~/.datasheets/client_credentials.json')
             try:
                 credentials = Credentials.from_authorized_user_file(credential_path)
             except IOError:
@@ -131,9 +316,8 @@ class Client(object):
         Uses the secrets stored at ``$DATASHEETS_SECRETS_PATH``
         (default: ``~/.datasheets/client_secrets.json``).
         """
-        unexpanded_client_secrets_path = os.environ.get('DATASHEETS_SECRETS_PATH',
-                                                        '~/.datasheets/client_secrets.json')
-        client_secrets_path = os.path.expanduser(unexpanded_client_secrets_path)
+        client_secrets_path = _resolve_path('DATASHEETS_SECRETS_PATH',
+                                            '~/.datasheets/client_secrets.json')
         scope = [
             'https://www.googleapis.com/auth/drive',
             'https://www.googleapis.com/auth/userinfo.email',
@@ -160,10 +344,81 @@ class Client(object):
         Returns:
             str: The file ID for the specified file
         """
-        matches = []
-        for f in self._fetch_info_on_items(kind=kind, name=filename):
-            matches.append(f)
+        file_id = self._get_cached_file_id(filename, kind)
+        if file_id is not None:
+            return file_id
+
+        # Two matches are enough to know the filename is ambiguous, so don't page any further
+        matches = self._fetch_info_on_items(kind=kind, name=filename, limit=2)
+        file_id = self._select_file_id(matches, kind)
+        self._cache_file_id(filename, kind, file_id)
+        return file_id
+
+    def _fetch_file_ids(self, filenames, kind):
+        """Return the file_ids for several Google Drive files using a single Drive query
 
+        This is equivalent to calling _fetch_file_id once per filename, except that all of the
+        names not already cached are resolved by one files.list query rather than one query per
+        name. The same exceptions are raised if any filename is missing or matches multiple files.
+
+        Args:
+            filenames (list): The names of the files we want to fetch the file_ids for
+            kind (str): Either 'spreadsheet' or 'folder'
+
+        Returns:
+            dict: A mapping of each filename to its file ID
+        """
+        file_ids = {}
+        for filename in filenames:
+            file_id = self._get_cached_file_id(filename, kind)
+            if file_id is not None:
+                file_ids[filename] = file_id
+
+        missing = set(filenames) - set(file_ids)
+        if not missing:
+            return file_ids
+
+        name_filters = ["name = '{}'".format(helpers._escape_query(f)) for f in missing]
+        query = "mimeType='application/vnd.google-apps.{}' and ({})".format(
+            kind, ' or '.join(name_filters))
+        fields = 'nextPageToken, files(name,id,modifiedTime,webViewLink)'
+
+        matches = collections.defaultdict(list)
+        for page in self._iter_info_pages(query=query, fields=fields):
+            for f in page:
+                matches[f['name']].append(f)
+
+        for filename in filenames:
+            if filename not in file_ids:
+                file_ids[filename] = self._select_file_id(matches[filename], kind)
+                self._cache_file_id(filename, kind, file_ids[filename])
+        return file_ids
+
+    def _get_cached_file_id(self, filename, kind):
+        """ Return the cached file_id for the given file, or None if it is missing or expired """
+        cached = self._file_id_cache.get((kind, filename))
+        if cached is not None and time.time() - cached[1] < _FILE_ID_CACHE_TTL:
+            return cached[0]
+        return None
+
+    def _cache_file_id(self, filename, kind, file_id):
+        """ Cache the file_id for the given file, evicting the oldest entry if the cache is full """
+        key = (kind, filename)
+        self._file_id_cache.pop(key, None)
+        self._file_id_cache[key] = (file_id, time.time())
+        if len(self._file_id_cache) > _FILE_ID_CACHE_SIZE:
+            self._file_id_cache.popitem(last=False)
+
+    def _select_file_id(self, matches, kind):
+        """Return the file_id of the only file in matches, raising an exception otherwise
+
+        Args:
+            matches (list): A list of dicts, one per file found with a given filename
+            kind (str): Either 'spreadsheet' or 'folder'
+
+        Returns:
+            str: The file ID of the matched file
+        """
         if len(matches) == 1:
             return matches[0]['id']
         elif len(matches) == 0 and kind == 'spreadsheet':
@@ -186,7 +441,7 @@ class Client(object):
         raise exceptions.MultipleWorkbooksFound(msg + formatted_output)
 
     def _fetch_info_on_items(self, kind, folder=None, name=None, only_mine=False,
-                             fields='files(name,id,modifiedTime,webViewLink)'):
+                             fields='files(name,id,modifiedTime,webViewLink)', limit=None):
         """Return info on workbooks or folders shared with the user
 
         Return a list of dicts, with each list representing one workbook or folder shared
@@ -204,6 +459,10 @@ class Client(object):
 
             fields (str): The fields to return in the results
 
+            limit (int): If provided, stop requesting further pages of results once at least
+                this many items have been found. Items on the page that reaches the limit are
+                all still returned
+
 
         Returns:
             list: A list of dicts, one dict per workbook or folder shared with the user
@@ -222,21 +481,39 @@ class Client(object):
             escaped_email = helpers._escape_query(self.email)
             query += " and '{}' in owners".format(escaped_email)
 
-        page_token = None
         raw_info = []
+        for page in self._iter_info_pages(query=query, fields=fields):
+            raw_info += page
+            if limit is not None and len(raw_info) >= limit:
+                break
 
+        return raw_info
+
+    def _iter_info_pages(self, query, fields):
+        """Page through the results of a Google Drive files.list query
+
+        Drive only hands out the token for the next page along with the current page, so pages
+        are necessarily requested one after another. Yielding each page as it arrives lets callers
+        start processing (or stop early) without waiting for the full result set.
+
+        Args:
+            query (str): The Drive query string (i.e. the 'q' parameter)
+            fields (str): The fields to return in the results, including nextPageToken
+
+        Yields:
+            list: A list of dicts, one dict per file on the current page
+        """
+        page_token = None
         while True:
             response = self.drive_svc.files().list(fields=fields, q=query,
                                                    orderBy='viewedByMeTime desc',
                                                    pageSize=1000,
                                                    pageToken=page_token).execute()
-            raw_info += response.get('files', [])
+            yield response.get('files', [])
             page_token = response.get('nextPageToken')
             if page_token is None:
                 break
 
-        return raw_info
-
     def _get_service_credentials(self):
         """Get credentials for a service account
 
@@ -247,17 +524,22 @@ class Client(object):
         Returns:
             google.oauth2.service_account.Credentials: instance of service credentials
         """
-        unexpanded_service_key_path = os.environ.get('DATASHEETS_SERVICE_PATH',
-                                                     '~/.datasheets/service_key.json')
-        service_key_path = os.path.expanduser(unexpanded_service_key_path)
-        with open(service_key_path) as f:
-            keyfile_dict = json.load(f)
+        service_key_path = _resolve_path('DATASHEETS_SERVICE_PATH', '~/.datasheets/service_key.json')
+        credentials = _load_service_credentials(service_key_path)
+        self.email = credentials.service_account_email  # used in __repr__
+        return credentials
 
-        self.email = keyfile_dict['client_email']  # used in __repr__
-        return service_account.Credentials.from_service_account_file(
-            service_key_path,
-            scopes=['https://www.googleapis.com/auth/drive']
-        )
+    def clear_file_cache(self):
+        """Forget the file_ids of recently fetched workbooks and folders
+
+        Workbooks and folders referenced by name are looked up in Google Drive and their file_id
+        is then reused for a short while. Call this if files may have been created, renamed, or
+        deleted elsewhere and a name needs to be looked up again immediately.
+
+        Returns:
+            None
+        """
+        self._file_id_cache.clear()
 
     def create_workbook(self, filename, folders=()):
         """Create a blank workbook with the specific filename
@@ -269,9 +551,8 @@ class Client(object):
         Returns:
             datasheets.Workbook: An instance of the newly created workbook
         """
-        root_file_id = self.drive_svc.files().get(fileId='root', fields='id').execute()['id']
-        folders = [self._fetch_file_id(filename=f, kind='folder') for f in folders]
-        folders = [root_file_id] + list(folders)
+        folder_ids = self._fetch_file_ids(folders, kind='folder') if folders else {}
+        folders = [self._root_file_id] + [folder_ids[f] for f in folders]
 
         body = {
             'mimeType': 'application/vnd.google-apps.spreadsheet',
@@ -279,6 +560,8 @@ class Client(object):
             'parents': folders
         }
         self.drive_svc.files().create(body=body).execute()
+        # A previously looked-up workbook of the same name may exist, so look the name up afresh
+        self._file_id_cache.pop(('spreadsheet', filename), None)
         return self.fetch_workbook(filename=filename)
 
     def delete_workbook(self, filename=None, file_id=None):
@@ -299,6 +582,9 @@ class Client(object):
         if not file_id:
             file_id = self._fetch_file_id(filename=filename, kind='spreadsheet')
         self.drive_svc.files().delete(fileId=file_id).execute()
+        for key, (cached_id, _) in list(self._file_id_cache.items()):
+            if cached_id == file_id:
+                del self._file_id_cache[key]
 
     def fetch_folders(self, only_mine=False):
         """Fetch all folders shared with this account
@@ -310,9 +596,8 @@ class Client(object):
             pandas.DataFrame: One row per folder listing folder name, ID, most recent modified
             time, and webview link to the folder
         """
-        fields = 'files(name,id,modifiedTime,webViewLink,owners(me))'
-        raw_info = self._fetch_info_on_items(kind='folder', only_mine=only_mine, fields=fields)
-        return pd.DataFrame(raw_info, columns=['name', 'id', 'modifiedTime', 'webViewLink'])
+        raw_info = self._fetch_info_on_items(kind='folder', only_mine=only_mine)
+        return _make_info_frame(raw_info)
 
     def fetch_workbook(self, filename=None, file_id=None):
         """Fetch a workbook
@@ -344,4 +629,4 @@ class Client(object):
             modified time, and webview link to the workbook
         """
         raw_info = self._fetch_info_on_items(kind='spreadsheet', folder=folder)
-        return pd.DataFrame(raw_info, columns=['name', 'id', 'modifiedTime', 'webViewLink'])
+        return _make_info_frame(raw_info)
@@ -5,9 +5,50 @@ These can be imported accessed directly from the datasheets module, e.g.::
 
     import datasheets
     tab = datasheets.create_tab_in_existing_workbook(myfilename, mytabname)
+
+Creating a datasheets.Client is relatively expensive (credentials are loaded and the Google API
+services are built), so the client these functions use is created once and then reused.
 """
 from datasheets.client import Client
 
+# The client created by _default_client() on first use
+_default_client_instance = None
+# A client explicitly provided through set_default_client(), which takes precedence if set
+_default_client_override = None
+
+
+def _default_client():
+    """Return the client used by the convenience functions, creating it on first use
+
+    Returns:
+        datasheets.Client: The client set via set_default_client() if there is one, otherwise a
+        user-authenticated client
+    """
+    global _default_client_instance
+    if _default_client_override is not None:
+        return _default_client_override
+
+    if _default_client_instance is None:
+        _default_client_instance = Client()
+    return _default_client_instance
+
+
+def set_default_client(client):
+    """Set the client used by the convenience functions
+
+    By default the convenience functions create and reuse a user-authenticated client. Use this
+    to have them use a client of your own instead, e.g. one authenticated as a service account.
+    Passing None reverts to the default behavior.
+
+    Args:
+        client (datasheets.Client): The client to use, or None
+
+    Returns:
+        None
+    """
+    global _default_client_override
+    _default_client_override = client
+
 
 def create_tab_in_existing_workbook(filename, tabname, file_id=None):
     """Create a new tab in an existing workbook and return an instance of that tab
@@ -30,7 +71,7 @@ def create_tab_in_existing_workbook(filename, tabname, file_id=None):
     """
     kwargs = {'file_id': file_id} if file_id is not None else {'filename': filename}
     return (
-        Client()
+        _default_client()
         .fetch_workbook(**kwargs)
         .create_tab(tabname)
     )
@@ -65,21 +106,14 @@ def create_tab_in_new_workbook(filename, tabname, emails=(), role='reader', noti
 
     """
     workbook = (
-        Client()
+        _default_client()
         .create_workbook(filename)
     )
 
-    tab = (
-        workbook
-        .create_tab(tabname)
-    )
-
-    workbook.delete_tab('Sheet1')
-
-    emails = [emails] if isinstance(emails, str) else emails
-    roles = [role] * len(emails) if isinstance(role, str) else role
+    # Add the new tab and remove the default 'Sheet1' tab within a single request
+    tab = workbook._replace_tab('Sheet1', tabname)
 
-    for this_email, this_role in zip(emails, roles):
-        workbook.share(email=this_email, role=this_role, notify=notify, message=message)
+    if emails:
+        workbook.share_many(emails, role=role, notify=notify, message=message)
 
     return tab
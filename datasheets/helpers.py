@@ -2,17 +2,55 @@
 Functionality used elsewhere. Almost all of these functions and classes are not
 intended to be utilized by the end-user and are not exposed in the external API.
 """
-import collections
-import contextlib
-import copy
 import datetime as dt
-import sys
+import functools
+import itertools
+import operator
+import re
+import types
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # Python 2
+    from collections import Mapping, Sequence
 
 import numpy as np
 import pandas as pd
 
 # Note: dates, times, and datetimes in Google Sheets are represented in 'serial number' format
 # as explained here: https://developers.google.com/sheets/reference/rest/v4/DateTimeRenderOption
+_SERIAL_NUMBER_EPOCH_DATE = dt.date(1899, 12, 30)
+_SERIAL_NUMBER_EPOCH_DATETIME = dt.datetime(1899, 12, 30)
+_SERIAL_NUMBER_EPOCH_DATETIME64 = np.datetime64('1899-12-30', 'us')
+_MICROSECONDS_PER_DAY = 24 * 60 * 60 * 10**6
+
+
+def _total_microseconds(delta):
+    """ Return the length of a datetime.timedelta as a whole number of microseconds """
+    return (delta.days * 24 * 60 * 60 + delta.seconds) * 10**6 + delta.microseconds
+
+
+# The offsets from the epoch, in microseconds, that _convert_serial_numbers can convert to date,
+# time, or datetime objects. Python's datetime only covers the years 1 to 9999, and
+# _serial_number_to_time can't handle negative serial numbers
+_SERIAL_NUMBER_MIN_OFFSET = _total_microseconds(dt.datetime.min - _SERIAL_NUMBER_EPOCH_DATETIME)
+_SERIAL_NUMBER_MAX_OFFSET = _total_microseconds(dt.datetime.max - _SERIAL_NUMBER_EPOCH_DATETIME)
+_SERIAL_NUMBER_OFFSET_RANGES = {'DATE': (_SERIAL_NUMBER_MIN_OFFSET, _SERIAL_NUMBER_MAX_OFFSET),
+                                'TIME': (0, _SERIAL_NUMBER_MAX_OFFSET),
+                                'DATE_TIME': (_SERIAL_NUMBER_MIN_OFFSET, _SERIAL_NUMBER_MAX_OFFSET)}
+
+
+def _serial_number_to_date(x):
+    return _SERIAL_NUMBER_EPOCH_DATE + dt.timedelta(days=x)
+
+
+def _serial_number_to_time(x):
+    return (dt.datetime.min + dt.timedelta(days=x)).time()
+
+
+def _serial_number_to_datetime(x):
+    return _SERIAL_NUMBER_EPOCH_DATETIME + dt.timedelta(days=x)
+
+
 _TYPE_CONVERSIONS = {'numberValue': float,
                      'stringValue': str,
                      'boolValue': bool,
@@ -21,15 +59,126 @@ _TYPE_CONVERSIONS = {'numberValue': float,
                      'NUMBER': float,
                      'PERCENT': float,
                      'CURRENCY': float,
-                     'DATE': lambda x: dt.date(1899, 12, 30) + dt.timedelta(days=x),
-                     'TIME': lambda x: (dt.datetime.min + dt.timedelta(days=x)).time(),
-                     'DATE_TIME': lambda x: dt.datetime(1899, 12, 30) + dt.timedelta(days=x),
+                     'DATE': _serial_number_to_date,
+                     'TIME': _serial_number_to_time,
+                     'DATE_TIME': _serial_number_to_datetime,
                      'SCIENTIFIC': float,
                      None: lambda x: x
                      }
 
 ASCII_CHAR_OFFSET = ord('A') - 1
 NUMBER_OF_LETTERS_IN_ALPHABET = 26
+_CELL_LABEL_PATTERN = re.compile(r'([A-Za-z]+)([1-9]\d*)')
+# As above, but matching only if nothing follows the row number
+_EXACT_CELL_LABEL_PATTERN = re.compile(r'([A-Za-z]+)([1-9]\d*)\Z')
+_DATELIKE_TYPES = (dt.date, dt.datetime, dt.time)
+_SERIAL_NUMBER_FORMATS = ('DATE', 'TIME', 'DATE_TIME')
+# NumPy dtype kinds (bool, int, unsigned int, and float) that can be bulk converted to floats
+_NUMERIC_KINDS = 'biuf'
+_FLOAT_TYPES = (float, np.floating)
+# Types that are always JSON serializable as they are. type(u'') and type(2**64) are unicode and
+# long in Python 2, and simply str and int again in Python 3
+_JSON_NATIVE_TYPES = frozenset([str, type(u''), int, type(2**64), bool, type(None)])
+# The number of DataFrame rows converted at a time when preparing an upload
+_DF_CHUNK_SIZE = 10000
+# Column labels already computed by _get_column_letter, keyed on column number
+_column_letters = {}
+# Column numbers already computed by _get_column_number, keyed on column label
+_column_numbers = {}
+
+# Characters that must be backslash-escaped within a quoted string in a Drive query
+_QUERY_ESCAPE_TABLE = {ord(u'\\'): u'\\\\', ord(u"'"): u"\\'"}
+
+
+class _cached_property(object):
+    """A read-only property that is computed on first access and then stored on the instance
+
+    Equivalent to functools.cached_property, which is only available in Python 3.8+. As the
+    computed value is stored in the instance's __dict__ under the property's name, later
+    lookups find it there and never reach this descriptor.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.__name__] = self.func(instance)
+        return value
+
+
+def _convert_serial_numbers(values, cell_format):
+    """Convert many serial numbers sharing a date or time format in a single pass
+
+    This is equivalent to applying the matching function from _TYPE_CONVERSIONS to each value,
+    but the offsets from the epoch are all computed at once as a NumPy datetime64 array. If any
+    value lies outside of the range that datetime objects can represent, the values are instead
+    converted one at a time so that they raise the same errors.
+
+    Args:
+        values (list): Serial numbers, i.e. the number of days since 1899-12-30
+        cell_format (str): One of 'DATE', 'TIME', or 'DATE_TIME'
+
+    Returns:
+        list: A list of datetime.date, datetime.time, or datetime.datetime objects
+    """
+    # Work in whole microseconds, the precision of datetime.timedelta. Whole days are split off
+    # first so that the float multiplication only has to be precise for the fraction of a day
+    values = np.asarray(values, dtype=float)
+    min_offset, max_offset = _SERIAL_NUMBER_OFFSET_RANGES[cell_format]
+    # Roughly check the range first, as far larger values would overflow the integer conversion
+    in_range = ((values >= float(min_offset) / _MICROSECONDS_PER_DAY - 1) &
+                (values <= float(max_offset) / _MICROSECONDS_PER_DAY + 1)).all()
+    if in_range:
+        days = np.floor(values)
+        microseconds = (days.astype(np.int64) * _MICROSECONDS_PER_DAY +
+                        np.round((values - days) * _MICROSECONDS_PER_DAY).astype(np.int64))
+        in_range = (microseconds >= min_offset).all() and (microseconds <= max_offset).all()
+    if not in_range:
+        # datetime64 values outside of datetime's range become ints rather than dates, so
+        # convert one at a time to raise an OverflowError instead
+        formatting_fn = _TYPE_CONVERSIONS[cell_format]
+        return [formatting_fn(value) for value in values.tolist()]
+
+    datetimes = _SERIAL_NUMBER_EPOCH_DATETIME64 + microseconds.astype('timedelta64[us]')
+
+    # Converting datetime64 values with a unit of days or microseconds to objects produces
+    # datetime.date and datetime.datetime objects respectively
+    if cell_format == 'DATE':
+        return datetimes.astype('datetime64[D]').astype(object).tolist()
+    datetimes = datetimes.astype(object).tolist()
+    if cell_format == 'TIME':
+        # The epoch falls at midnight, so adding it doesn't change the time of day
+        return [d.time() for d in datetimes]
+    return datetimes
+
+
+def _convert_cell_values(values, cell_format):
+    """Convert many cell values sharing a format in a single pass
+
+    Values that are all numeric are converted as a NumPy array rather than one at a time. For
+    anything else each value is passed through the matching function from _TYPE_CONVERSIONS.
+
+    Args:
+        values (list): The values of cells whose format is cell_format
+        cell_format (str): A key within _TYPE_CONVERSIONS
+
+    Returns:
+        list: The converted values, in the same order as values
+
+    Raises:
+        TypeError, ValueError: If any one of the values can't be converted
+    """
+    formatting_fn = _TYPE_CONVERSIONS[cell_format]
+    if formatting_fn is float or cell_format in _SERIAL_NUMBER_FORMATS:
+        array = np.asarray(values)
+        if array.dtype.kind in _NUMERIC_KINDS:
+            if formatting_fn is float:
+                return array.astype(float).tolist()
+            return _convert_serial_numbers(array, cell_format)
+    return [formatting_fn(value) for value in values]
 
 
 def _convert_nan_and_datelike_values(values):
@@ -42,23 +191,41 @@ def _convert_nan_and_datelike_values(values):
         list: A copy of the list, with datelike-object converted to strings and np.nans
             converted to None
     """
-    output = []
-    for row in values:
-        new_row = []
-        for item in row:
-            if isinstance(item, np.float) and np.isnan(item):
-                new_row.append(None)
-            elif isinstance(item, (dt.date, dt.datetime, dt.time)):
-                new_row.append(str(item))
-            else:
-                new_row.append(item)
-        output.append(new_row)
+    # Checking the types present is far cheaper than converting each item, and data without
+    # any floats or datelike objects (e.g. only strings and ints) then needs no conversion
+    if set(map(type, itertools.chain.from_iterable(values))) <= _JSON_NATIVE_TYPES:
+        return [list(row) for row in values]
+    return [[_convert_nan_and_datelike_value(item) for item in row] for row in values]
+
+
+def _convert_nan_and_datelike_value(item):
+    """ Make a single item JSON serializable; see _convert_nan_and_datelike_values """
+    # NaN is the only value not equal to itself, which is far cheaper to check than np.isnan.
+    # np.float64 subclasses float but the other NumPy float types (e.g. np.float32) do not
+    if isinstance(item, _FLOAT_TYPES) and item != item:
+        return None
+    elif isinstance(item, _DATELIKE_TYPES):
+        return str(item)
+    return item
 
-    return output
+
+_convert_nan_and_datelike_array = np.frompyfunc(_convert_nan_and_datelike_value, 1, 1)
 
 
 def _escape_query(query):
-    return query.replace("\\", "\\\\").replace("'", r"\'")
+    """Escape backslashes and single quotes in a string to be embedded in a Drive query
+
+    Args:
+        query (str): The raw string, e.g. a file or folder name
+
+    Returns:
+        str: The escaped string
+    """
+    try:
+        return query.translate(_QUERY_ESCAPE_TABLE)
+    except TypeError:
+        # Python 2 byte strings only accept a 256-character translation table
+        return query.replace("\\", "\\\\").replace("'", r"\'")
 
 
 def _find_max_nonempty_row(data):
@@ -73,29 +240,66 @@ def _find_max_nonempty_row(data):
     Returns:
         int: Index associated with the last non-empty row (i.e. the last list that is not all Nones)
     """
-    is_not_empty = lambda row: row.count(None) != len(row)
-    nonempty_rows = list(map(is_not_empty, data))
+    # Work backwards so that we can stop at the first non-empty row, checking each row only
+    # until its first non-None value
+    for row_index in range(len(data) - 1, -1, -1):
+        if any(item is not None for item in data[row_index]):
+            return row_index
 
-    if nonempty_rows.count(True):
-        max_nonempty_index = max(loc for loc, val in enumerate(nonempty_rows) if val)
-        return max_nonempty_index
 
+def _find_populated_extent(data):
+    """Identify the number of rows and columns spanned by the populated cells of a table
 
-def _get_column_letter(col_idx):
-    """ Convert a column number into a label, e.g. 3 -> C, 27 -> AA, 53 -> BA, etc. """
-    quotient, remainder = divmod(col_idx, NUMBER_OF_LETTERS_IN_ALPHABET)
-    suffix = chr(remainder + ASCII_CHAR_OFFSET)
-    if quotient == 0:
-        return suffix
+    As when Google Sheets reports the populated cells of a tab, trailing empty cells (None or
+    empty strings) within a row and trailing empty rows are not counted.
+
+    Args:
+        data (list): A list of lists, with each sublist representing a row in the table
+
+    Returns:
+        tuple: The number of rows and the number of columns, in (nrows, ncols) form
+    """
+    nrows = ncols = 0
+    for row_number, row in enumerate(data, 1):
+        width = len(row)
+        while width and (row[width - 1] is None or row[width - 1] == ''):
+            width -= 1
+        if width:
+            nrows = row_number
+            ncols = max(ncols, width)
+    return nrows, ncols
 
-    return _get_column_letter(quotient) + suffix
+
+def _get_column_letter(col_idx):
+    """ Convert a column number into a label, e.g. 3 -> C, 26 -> Z, 27 -> AA, 53 -> BA, etc. """
+    if col_idx not in _column_letters:
+        letters = bytearray()
+        remaining = col_idx
+        while remaining:
+            # Column labels are bijective base-26 (there is no zero digit), hence the -1
+            remaining, remainder = divmod(remaining - 1, NUMBER_OF_LETTERS_IN_ALPHABET)
+            letters.append(remainder + ASCII_CHAR_OFFSET + 1)
+        _column_letters[col_idx] = letters[::-1].decode('ascii')
+    return _column_letters[col_idx]
+
+
+def _get_column_number(column_label):
+    """ Convert a column label into a number, e.g. C -> 3, z -> 26, AA -> 27, etc. """
+    if column_label not in _column_numbers:
+        col = 0
+        # Iterating over bytes yields the character codes directly, saving an ord() call per letter
+        for char_code in bytearray(column_label.upper().encode('ascii')):
+            col = col * NUMBER_OF_LETTERS_IN_ALPHABET + (char_code - ASCII_CHAR_OFFSET)
+        _column_numbers[column_label] = col
+    return _column_numbers[column_label]
 
 
 def _make_list_of_lists(data, index):
     """Convert the input data to a list of lists, which Google Sheets requires for uploads.
 
     Note that the headers is a list of lists because we may have multiple rows of headers for
-    DataFrames
+    DataFrames. Both the headers and values are made JSON serializable (see
+    _convert_nan_and_datelike_values) as part of the conversion.
 
     Args:
         data (pandas.DataFrame or list): The data set to be converted
@@ -103,25 +307,30 @@ def _make_list_of_lists(data, index):
             applicable if `data` is a pandas.DataFrame
 
     Returns:
-        list: A list of lists representing the input data set
+        tuple: The headers and the values, each a list of lists representing the input data set
     """
     if isinstance(data, pd.DataFrame):
         headers = _process_df_headers(data, index)
+        # DataFrame values are converted column by column within _process_df_values
         values = _process_df_values(data, index)
-    elif isinstance(data, collections.Sequence) and isinstance(data[0], collections.Mapping):
-        headers = [list(data[0].keys())]
-        values = []
-        for row in data:
-            # We have to ensure we return the values in the same order, i.e. get them by key
-            row_values = [row[key] for key in headers[0]]
-            values.append(row_values)
+    elif isinstance(data, Sequence) and isinstance(data[0], Mapping):
+        keys = list(data[0].keys())
+        headers = [keys]
+        # We have to ensure we return the values in the same order, i.e. get them by key
+        if len(keys) > 1:
+            get_row_values = operator.itemgetter(*keys)
+            values = [list(get_row_values(row)) for row in data]
+        else:
+            # itemgetter returns a bare value rather than a tuple when given a single key
+            values = [[row[key] for key in keys] for row in data]
+        values = _convert_nan_and_datelike_values(values)
     elif isinstance(data, list) and isinstance(data[0], list):
         headers = []
-        values = data
+        values = _convert_nan_and_datelike_values(data)
     else:
         raise ValueError('Input data must be a pandas.DataFrame, a list of dicts, or a list of lists')
 
-    return headers, values
+    return _convert_nan_and_datelike_values(headers), values
 
 
 def _process_df_headers(data, index):
@@ -138,13 +347,18 @@ def _process_df_headers(data, index):
     is_multiindex = isinstance(data.columns, pd.MultiIndex)
     idx_names = _process_df_index_names(data)
 
+    if is_multiindex:
+        # A MultiIndex stores each level separately, so read the levels directly rather than
+        # materializing a tuple per column and transposing them
+        column_names = [data.columns.get_level_values(i).tolist()
+                        for i in range(data.columns.nlevels)]
+
     if index and is_multiindex:
-        column_names = map(list, zip(*data.columns))
         return [idx_names + row for row in column_names]
     elif index and not is_multiindex:
         return [idx_names + data.columns.tolist()]
     elif (not index) and is_multiindex:
-        return list(map(list, zip(*data.columns)))
+        return column_names
     else:
         # not is_multiindex and not index
         return [data.columns.tolist()]
@@ -172,6 +386,11 @@ def _process_df_index_names(data):
 def _process_df_values(data, index):
     """Create a list containing the row(s) of a pandas.DataFrame
 
+    The values are made JSON serializable in the same way as by _convert_nan_and_datelike_values,
+    but as each column has a single dtype this is done a column at a time: integer and boolean
+    columns need no changes, float columns only need their NaNs replaced, and only the remaining
+    columns (e.g. strings and dates) are converted item by item.
+
     Args:
         data (pandas.DataFrame): The data se to process values from
         index (bool): Whether the index should be processed as well
@@ -179,11 +398,81 @@ def _process_df_values(data, index):
     Returns:
         list: A list of lists, with each sublist representing one row in the input data set
     """
-    if index and isinstance(data.index, pd.MultiIndex):
-        mapping = lambda row: list(row[0] + row[1:])
-        return list(map(mapping, data.itertuples(index=index)))
-    else:
-        return list(map(list, data.itertuples(index=index)))
+    values = []
+    for rows in _iter_df_value_chunks(data, index):
+        values.extend(rows)
+    return values
+
+
+def _iter_df_value_chunks(data, index, chunk_size=_DF_CHUNK_SIZE):
+    """Generate the row(s) of a pandas.DataFrame a chunk of rows at a time
+
+    Converting the whole DataFrame at once would temporarily hold an extra object array the size
+    of the DataFrame (two when the index is included). Working through it in chunks means only
+    one chunk's worth of intermediate arrays exists at any point.
+
+    Args:
+        data (pandas.DataFrame): The data set to process values from
+        index (bool): Whether the index should be processed as well
+        chunk_size (int): The maximum number of rows to convert at once
+
+    Yields:
+        list: A list of lists, with each sublist representing one row in the input data set
+    """
+    dtypes = list(data.dtypes)
+    if index:
+        dtypes = [data.index.get_level_values(i).dtype for i in range(data.index.nlevels)] + dtypes
+
+    for start in range(0, len(data), chunk_size):
+        chunk = data.iloc[start:start + chunk_size]
+        # Casting to object converts each column to Python-level values in one pass, so the rows
+        # can be produced by a single ndarray.tolist() call rather than by iterating over tuples
+        values = chunk.astype(object).values
+        if index:
+            # Each level of a MultiIndex becomes its own column, just as with a regular index
+            index_levels = [chunk.index.get_level_values(i).astype(object)
+                            for i in range(chunk.index.nlevels)]
+            values = np.column_stack(index_levels + [values])
+
+        for i, dtype in enumerate(dtypes):
+            kind = dtype.kind if isinstance(dtype, np.dtype) else None
+            if kind in ('i', 'u', 'b'):
+                continue
+            elif kind == 'f':
+                values[pd.isnull(values[:, i]), i] = None
+            else:
+                values[:, i] = _convert_nan_and_datelike_array(values[:, i])
+
+        yield values.tolist()
+
+
+def _refresh_token_before_call(method):
+    """ Wrap a method so that the instance's OAuth token is refreshed (if needed) before it runs """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._refresh_token_if_needed()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _refresh_token_on_public_calls(cls):
+    """Class decorator that refreshes the OAuth token before each user-facing method call
+
+    Every public method (i.e. one whose name does not start with an underscore) defined on the
+    class is wrapped once, at class creation time, to call ``self._refresh_token_if_needed()``
+    before running. Private methods are left untouched so that the check is not repeated by the
+    internal calls a single user action makes, and attribute reads incur no overhead at all.
+
+    Args:
+        cls (type): The class whose public methods should be wrapped
+
+    Returns:
+        type: The same class, with its public methods wrapped
+    """
+    for name, attr in list(vars(cls).items()):
+        if isinstance(attr, types.FunctionType) and not name.startswith('_'):
+            setattr(cls, name, _refresh_token_before_call(attr))
+    return cls
 
 
 def _remove_trailing_nones(array):
@@ -196,22 +485,23 @@ def _remove_trailing_nones(array):
 def _resize_row(array, new_len):
     """Alter the size of a list to match a specified length
 
-    If the list is too long, trim it. If it is too short, pad it with Nones
+    If the list is too long, trim it. If it is too short, pad it with Nones. The list is resized
+    in place to avoid building intermediate copies
 
     Args:
         array (list): The data set to pad or trim
         new_len int): The desired length for the data set
 
     Returns:
-        list: A copy of the input `array` that has been extended or trimmed
+        list: The input `array`, which has been extended or trimmed
     """
     current_len = len(array)
     if current_len > new_len:
-        return array[:new_len]
-    else:
+        del array[new_len:]
+    elif current_len < new_len:
         # pad the row with Nones
-        padding = [None] * (new_len - current_len)
-        return array + padding
+        array.extend([None] * (new_len - current_len))
+    return array
 
 
 def convert_cell_index_to_label(row, col):
@@ -238,9 +528,12 @@ def convert_cell_index_to_label(row, col):
     if row < 1 or col < 1:
         raise ValueError('Row and column values must be >= 1')
 
-    column_label = _get_column_letter(col)
-    label = '{}{}'.format(column_label, row)
-    return label
+    if col <= NUMBER_OF_LETTERS_IN_ALPHABET:
+        # Single-letter columns are by far the most common, so skip the general conversion
+        column_label = chr(col + ASCII_CHAR_OFFSET)
+    else:
+        column_label = _get_column_letter(col)
+    return column_label + str(row)
 
 
 def convert_cell_label_to_index(label):
@@ -260,23 +553,28 @@ def convert_cell_label_to_index(label):
     Returns:
         tuple: The cell reference in (row_int, col_int) form
     """
+    return _convert_cell_label_to_index(label, _CELL_LABEL_PATTERN)
+
+
+def _convert_exact_cell_label_to_index(label):
+    """Convert a cell label into (row, col) form, rejecting anything after the row number
+
+    Unlike convert_cell_label_to_index(), labels such as 'A1B' or 'A1:B2' raise a ValueError
+    rather than being read as their leading cell label.
+    """
+    return _convert_cell_label_to_index(label, _EXACT_CELL_LABEL_PATTERN)
+
+
+def _convert_cell_label_to_index(label, pattern):
+    """ Convert a cell label into (row, col) form using the given compiled pattern """
     if not isinstance(label, str):
         raise ValueError('Input must be a string')
 
-    import re
-
     # Split out the letters from the numbers
-    pattern = r'([A-Za-z]+)([1-9]\d*)'
-    match = re.match(pattern, label)
+    match = pattern.match(label)
 
     if not match:
         raise ValueError('Unable to parse user-provided label')
 
-    column_label = match.group(1).upper()
-    row = int(match.group(2))
-
-    col = 0
-    for c in column_label:
-        col = col * NUMBER_OF_LETTERS_IN_ALPHABET + (ord(c) - ASCII_CHAR_OFFSET)
-
-    return (row, col)
+    column_label, row = match.groups()
+    return (int(row), _get_column_number(column_label))
@@ -1,4 +1,4 @@
-import types
+import contextlib
 from collections import OrderedDict
 
 import apiclient
@@ -6,9 +6,15 @@ import pandas as pd
 
 from datasheets import exceptions, helpers
 
+# The effective value and format that Google Sheets omits for empty and unformatted cells.
+# These are shared so that _process_rows doesn't build new dicts for every cell lacking them
+_EMPTY_CELL_VALUE = {None: None}
+_EMPTY_CELL_FORMAT = {}
 
+
+@helpers._refresh_token_on_public_calls
 class Tab(object):
-    def __init__(self, tabname, workbook, drive_svc, sheets_svc):
+    def __init__(self, tabname, workbook, drive_svc, sheets_svc, properties=None):
         """Create a datasheets.Tab instance of an existing Google Sheets tab.
 
         This class in not intended to be directly instantiated; it is created by
@@ -19,42 +25,31 @@ class Tab(object):
             workbook (datasheets.Workbook): The workbook instance that instantiated this tab
             drive_svc (googleapiclient.discovery.Resource): An instance of Google Drive
             sheets_svc (googleapiclient.discovery.Resource): An instance of Google Sheets
+            properties (dict): The tab's properties, if already known (e.g. from the reply to
+                the request that created the tab). If not provided they are fetched
         """
         self.tabname = tabname
         self._workbook = workbook
         self.drive_svc = drive_svc
         self.sheets_svc = sheets_svc
+        # batchUpdate requests held back while inside batched(), or None when not batching
+        self._pending_requests = None
 
-        # Get basic properties of the tab. We do this here partly
-        # to force failures early if tab can't be found
-        try:
-            self._update_tab_properties()
-        except apiclient.errors.HttpError as e:
-            if 'Unable to parse range'.encode() in e.content:
-                raise exceptions.TabNotFound('The given tab could not be found. Error generated: {}'.format(e))
-            else:
-                raise
+        if properties is not None:
+            self.properties = properties
+        else:
+            # Get basic properties of the tab. We do this here partly
+            # to force failures early if tab can't be found
+            try:
+                self._update_tab_properties()
+            except apiclient.errors.HttpError as e:
+                if 'Unable to parse range'.encode() in e.content:
+                    raise exceptions.TabNotFound('The given tab could not be found. Error generated: {}'.format(e))
+                else:
+                    raise
 
         self.url = 'https://docs.google.com/spreadsheets/d/{}#gid={}'.format(self.workbook.file_id, self.tab_id)
 
-    def __getattribute__(self, attr):
-        """Get an attribute (variable or method) of this instance of this class
-
-        For client OAuth, before each user-facing method call this method will verify that the
-        access token is not expired and refresh it if it is.
-
-        We only refresh on user-facing method calls since otherwise we'd be refreshing multiple
-        times per user action (once for the user call, possibly multiple times for the private
-        method calls invoked by it).
-        """
-        requested_attr = super(Tab, self).__getattribute__(attr)
-
-        if isinstance(requested_attr, types.MethodType) \
-           and not attr.startswith('_'):
-            self.workbook.client._refresh_token_if_needed()
-
-        return requested_attr
-
     def __repr__(self):
         msg = "<{module}.{name}(filename='{filename}', tabname='{tabname}')>"
         return msg.format(module=self.__class__.__module__,
@@ -62,6 +57,33 @@ class Tab(object):
                           filename=self.workbook.filename,
                           tabname=self.tabname)
 
+    @staticmethod
+    def _convert_cell_value(cell_value, cell_format):
+        """Convert a single cell's value according to its format
+
+        Args:
+            cell_value: The cell's effective value as returned by Google Sheets
+            cell_format (str): The cell's number format type, or its value type if it has none
+
+        Returns:
+            The converted value, or cell_value unchanged if it can't be converted
+        """
+        formatting_fn = helpers._TYPE_CONVERSIONS[cell_format]
+        try:
+            return formatting_fn(cell_value)
+        except ValueError:
+            return cell_value
+        except TypeError:
+            raise TypeError(
+                "Mismatch exists in expected and actual data types for cell with "
+                "value '{value}'. Cell format is '{cell_format}' but cell value type "
+                "is '{value_type}'. To correct this, in Google Sheets set the "
+                "appropriate cell format or set it to Automatic".format(
+                    value=cell_value,
+                    cell_format=cell_format,
+                    value_type=type(cell_value))
+            )
+
     @staticmethod
     def _process_rows(raw_data):
         """Prepare a tab's raw data so that a pandas.DataFrame can be produced from it
@@ -74,51 +96,63 @@ class Tab(object):
         """
         raw_rows = raw_data['sheets'][0]['data'][0].get('rowData', {})
         rows = []
+        # The values needing conversion and their row and column numbers, keyed on cell format
+        values_by_format = {}
         for row_num, row in enumerate(raw_rows):
-            row_values = []
-            for col_num, cell in enumerate(row.get('values', {})):
+            # Each row starts out as all Nones (i.e. empty cells). Values needing conversion are
+            # filled in once converted, so only the remaining non-empty values are set here
+            cells = row.get('values', ())
+            row_values = [None] * len(cells)
+            for col_num, cell in enumerate(cells):
                 # If the cell is empty, use None
-                value = cell.get('effectiveValue', {None: None})
+                value = cell.get('effectiveValue', _EMPTY_CELL_VALUE)
 
                 # If a cell has an error in it (e.g. someone divides by zero, adds a number to
                 # text, etc.), then we raise an exception.
-                if 'errorValue' in value.keys():
+                if 'errorValue' in value:
                     cell_label = helpers.convert_cell_index_to_label(row_num+1, col_num+1)
                     error_type = value['errorValue'].get('type', 'unknown type')
                     error_message = value['errorValue'].get('message', 'unknown error message')
                     msg = 'Error of type "{}" within cell {} prevents fetching data. Message: "{}"'
                     raise exceptions.FetchDataError(msg.format(error_type, cell_label, error_message))
 
-                # value is a dict with only 1 key so this next(iter()) is safe
-                base_fmt, cell_value = next(iter(value.items()))
-
-                num_fmt = cell.get('effectiveFormat', {}).get('numberFormat')
-                if num_fmt:
-                    cell_format = num_fmt['type']
-                else:
-                    cell_format = base_fmt
+                # value is a dict with only 1 key, so its single item can be unpacked directly
+                (base_fmt, cell_value), = value.items()
 
-                formatting_fn = helpers._TYPE_CONVERSIONS[cell_format]
+                # Defer conversion so that each format's values can be converted together
                 if cell_value:
-                    try:
-                        cell_value = formatting_fn(cell_value)
-                    except ValueError:
-                        pass
-                    except TypeError:
-                        raise TypeError(
-                            "Mismatch exists in expected and actual data types for cell with "
-                            "value '{value}'. Cell format is '{cell_format}' but cell value type "
-                            "is '{value_type}'. To correct this, in Google Sheets set the "
-                            "appropriate cell format or set it to Automatic".format(
-                                value=cell_value,
-                                cell_format=cell_format,
-                                value_type=type(cell_value))
-                        )
-                row_values.append(cell_value)
+                    num_fmt = cell.get('effectiveFormat', _EMPTY_CELL_FORMAT).get('numberFormat')
+                    cell_format = num_fmt['type'] if num_fmt else base_fmt
+                    # Look the group up before creating one, to avoid building three lists for
+                    # every cell only to discard them
+                    group = values_by_format.get(cell_format)
+                    if group is None:
+                        group = values_by_format[cell_format] = ([], [], [])
+                    row_nums, col_nums, values = group
+                    row_nums.append(row_num)
+                    col_nums.append(col_num)
+                    values.append(cell_value)
+                elif cell_value is not None:
+                    row_values[col_num] = cell_value
 
             rows.append(row_values)
+
+        for cell_format, (row_nums, col_nums, values) in values_by_format.items():
+            try:
+                converted = helpers._convert_cell_values(values, cell_format)
+            except (TypeError, ValueError):
+                # Fall back to converting one at a time so that a single bad value doesn't
+                # prevent the rest from being converted
+                converted = [Tab._convert_cell_value(value, cell_format) for value in values]
+            for row_num, col_num, value in zip(row_nums, col_nums, converted):
+                rows[row_num][col_num] = value
         return rows
 
+    @helpers._cached_property
+    def _values_svc(self):
+        """ The Sheets service's spreadsheets.values resource, which is costly to rebuild """
+        return self.sheets_svc.values()
+
     @property
     def ncols(self):
         """ Property for the number (int) of columns in the tab """
@@ -146,11 +180,240 @@ class Tab(object):
                             'length': n
                             }
                         }
-        body = {'requests': [request_body]}
-        self.workbook.batch_update(body)
-        self._update_tab_properties()
+        self._send_requests([request_body])
+
+        # Update the cached dimensions ourselves rather than fetching them again
+        count_field = 'rowCount' if kind == 'ROWS' else 'columnCount'
+        self.properties['gridProperties'][count_field] += int(n)
+
+    def _align_cells_requests(self, horizontal, vertical):
+        """ Build the batchUpdate requests for align_cells() """
+        request_body = {'repeatCell': {
+                             'range': {
+                                  'sheetId': self.tab_id,
+                                  'startRowIndex': 0,
+                                  'endRowIndex': self.nrows
+                              },
+                             'cell': {
+                                  'userEnteredFormat': {
+                                       'horizontalAlignment': horizontal,
+                                       'verticalAlignment': vertical,
+                                        }
+                                   },
+                             'fields': 'userEnteredFormat(horizontalAlignment,verticalAlignment)'
+                              }
+                        }
+        return [request_body]
+
+    def _alter_dimensions_requests(self, nrows, ncols):
+        """ Build the batchUpdate requests for alter_dimensions() """
+        request_body = {'updateSheetProperties': {
+                             'properties': {
+                                 'sheetId': self.tab_id,
+                                 'gridProperties': {
+                                     'columnCount': ncols or self.ncols,
+                                     'rowCount': nrows or self.nrows
+                                     }
+                                 },
+                             'fields': 'gridProperties(columnCount, rowCount)'
+                             }
+                        }
+        return [request_body]
+
+    def _autoformat(self, n_header_rows, nrows, ncols):
+        """Apply autoformat()'s stylings to the tab, trimming it to the given dimensions
+
+        Args:
+            n_header_rows (int): The number of header rows (i.e. row of labels / metadata)
+            nrows (int): The number of rows spanned by the tab's populated cells
+            ncols (int): The number of columns spanned by the tab's populated cells
+
+        Returns:
+            None
+        """
+        # Send every styling in a single batchUpdate. Google Sheets applies the requests in
+        # order, so the dimension trim goes last to let the other requests span the whole tab.
+        requests = self._format_headers_requests(n_header_rows)
+        requests += self._format_font_requests(font='Proxima Nova', size=10)
+        requests += self._align_cells_requests(horizontal='LEFT', vertical='MIDDLE')
+        requests += self._autosize_columns_requests()
+        requests += self._alter_dimensions_requests(nrows=nrows, ncols=ncols)
+        self._send_requests(requests)
+
+        self.properties['gridProperties']['frozenRowCount'] = n_header_rows
+        self._set_dimensions(nrows, ncols)
+
+    def _autosize_columns_requests(self):
+        """ Build the batchUpdate requests for autosize_columns() """
+        request_body = {'autoResizeDimensions': {
+                            'dimensions': {
+                                  'sheetId': self.tab_id,
+                                  'dimension': 'COLUMNS',
+                                  'startIndex': 0,
+                                  'endIndex': self.ncols
+                                  }
+                            }
+                        }
+        return [request_body]
+
+    def _expand_to_fit(self, updated_range):
+        """Grow the cached tab dimensions to include a range that data was just written to
+
+        Google Sheets automatically adds rows and columns to a tab when data is written beyond
+        its edges. Rather than fetching the tab's properties again after each write, we enlarge
+        the cached dimensions using the updated range reported in the write's response.
+
+        Args:
+            updated_range (str): The A1 notation range that was written to, e.g. 'Sheet1!A1:C10'
+        """
+        if not updated_range:
+            return
+        last_cell = str(updated_range.rsplit('!', 1)[-1].split(':')[-1])
+        last_row, last_col = helpers._convert_exact_cell_label_to_index(last_cell)
+        grid_properties = self.properties['gridProperties']
+        grid_properties['rowCount'] = max(grid_properties['rowCount'], last_row)
+        grid_properties['columnCount'] = max(grid_properties['columnCount'], last_col)
+
+    def _fetch_data(self, headers, fmt, typed):
+        """ Retrieve the data within this tab; see fetch_data() """
+        if fmt not in ('df', 'dict', 'list'):
+            raise ValueError("Unexpected value '{}' for parameter `fmt`. "
+                             "Accepted values are 'df', 'dict', and 'list'".format(fmt))
+
+        if typed:
+            fields = 'sheets/data/rowData/values(effectiveValue,effectiveFormat/numberFormat/type)'
+            raw_data = self.sheets_svc.get(spreadsheetId=self.workbook.file_id,
+                                           ranges=self.tabname, includeGridData=True,
+                                           fields=fields).execute()
+            processed_rows = self._process_rows(raw_data)
+        else:
+            raw_data = self._values_svc.get(spreadsheetId=self.workbook.file_id,
+                                            range=self.tabname,
+                                            valueRenderOption='UNFORMATTED_VALUE',
+                                            dateTimeRenderOption='SERIAL_NUMBER',
+                                            fields='values').execute()
+            # Empty cells come back as empty strings; use None for them as _process_rows does
+            processed_rows = [[None if value == '' else value for value in row]
+                              for row in raw_data.get('values', [])]
+
+        # filter out empty rows
+        max_idx = helpers._find_max_nonempty_row(processed_rows)
+
+        if max_idx is None:
+            if fmt == 'df':
+                return pd.DataFrame([])
+            elif fmt == 'dict':
+                return []
+            else:
+                return ([], [])
+
+        processed_rows = processed_rows[:max_idx+1]
+
+        # remove trailing Nones on rows
+        processed_rows = list(map(helpers._remove_trailing_nones, processed_rows))
+
+        if headers:
+            header_names = processed_rows.pop(0)
+            max_width = len(header_names)
+        else:
+            # Iterate through rows to find widest one
+            max_width = max(map(len, processed_rows))
+            header_names = list(range(max_width))
+
+        # resize the rows to match the number of column headers
+        processed_rows = [helpers._resize_row(row, max_width) for row in processed_rows]
+
+        if fmt == 'df':
+            df = pd.DataFrame(data=processed_rows, columns=header_names)
+            return df
+        elif fmt == 'dict':
+            make_row_dict = lambda row: OrderedDict(zip(header_names, row))
+            return list(map(make_row_dict, processed_rows))
+        else:
+            return header_names, processed_rows
+
+    def _format_font_requests(self, font, size):
+        """ Build the batchUpdate requests for format_font() """
+        request_body = {'repeatCell': {
+                            'range': {'sheetId': self.tab_id},
+                            'cell': {
+                                'userEnteredFormat': {
+                                    'textFormat': {
+                                        'fontSize': size,
+                                        'fontFamily': font
+                                        }
+                                    }
+                                },
+                            'fields': 'userEnteredFormat(textFormat(fontSize,fontFamily))'
+                            }
+                        }
+        return [request_body]
+
+    def _format_headers_requests(self, nrows):
+        """ Build the batchUpdate requests for format_headers() """
+        return [
+          {
+            'repeatCell': {
+              'range': {
+                'sheetId': self.tab_id,
+                'startRowIndex': 0,
+                'endRowIndex': nrows
+              },
+              'cell': {
+                'userEnteredFormat': {
+                  'backgroundColor': {
+                    'red': 0.26274511,
+                    'green': 0.26274511,
+                    'blue': 0.26274511
+                  },
+                  'horizontalAlignment': 'LEFT',
+                  'textFormat': {
+                    'foregroundColor': {
+                      'red': 0.95294118,
+                      'green': 0.95294118,
+                      'blue': 0.95294118
+                    },
+                    'fontSize': 10,
+                    'fontFamily': 'Proxima Nova',
+                    'bold': False
+                  }
+                }
+              },
+              'fields': 'userEnteredFormat(backgroundColor,textFormat,horizontalAlignment)'
+            }
+          },
+          {
+            'updateSheetProperties': {
+              'properties': {
+                'sheetId': self.tab_id,
+                'gridProperties': {
+                  'frozenRowCount': nrows
+                }
+              },
+              'fields': 'gridProperties(frozenRowCount)'
+            }
+          }
+        ]
+
+    def _refresh_token_if_needed(self):
+        """ Refresh the client's access token if needed; see Client._refresh_token_if_needed """
+        self.workbook.client._refresh_token_if_needed()
+
+    def _send_requests(self, requests):
+        """ Send batchUpdate requests for this tab, or hold them until batched() exits """
+        if self._pending_requests is not None:
+            self._pending_requests.extend(requests)
+        else:
+            self.workbook.batch_update({'requests': requests})
+
+    def _set_dimensions(self, nrows, ncols):
+        """ Record new dimensions for the tab in its cached properties """
+        grid_properties = self.properties['gridProperties']
+        grid_properties['rowCount'] = nrows or grid_properties['rowCount']
+        grid_properties['columnCount'] = ncols or grid_properties['columnCount']
 
     def _update_tab_properties(self):
+        """ Fetch the tab's properties (e.g. its dimensions) from Google Sheets """
         raw_properties = self.sheets_svc.get(spreadsheetId=self.workbook.file_id,
                                              ranges=self.tabname + '!A1',
                                              fields='sheets/properties').execute()
@@ -191,23 +454,7 @@ class Tab(object):
         Returns:
             None
         """
-        request_body = {'repeatCell': {
-                             'range': {
-                                  'sheetId': self.tab_id,
-                                  'startRowIndex': 0,
-                                  'endRowIndex': self.nrows
-                              },
-                             'cell': {
-                                  'userEnteredFormat': {
-                                       'horizontalAlignment': horizontal,
-                                       'verticalAlignment': vertical,
-                                        }
-                                   },
-                             'fields': 'userEnteredFormat(horizontalAlignment,verticalAlignment)'
-                              }
-                        }
-        body = {'requests': [request_body]}
-        self.workbook.batch_update(body)
+        self._send_requests(self._align_cells_requests(horizontal, vertical))
 
     def alter_dimensions(self, nrows=None, ncols=None):
         """Alter the dimensions of the current tab.
@@ -223,20 +470,8 @@ class Tab(object):
         Returns:
             None
         """
-        request_body = {'updateSheetProperties': {
-                             'properties': {
-                                 'sheetId': self.tab_id,
-                                 'gridProperties': {
-                                     'columnCount': ncols or self.ncols,
-                                     'rowCount': nrows or self.nrows
-                                     }
-                                 },
-                             'fields': 'gridProperties(columnCount, rowCount)'
-                             }
-                        }
-        body = {'requests': [request_body]}
-        self.workbook.batch_update(body)
-        self._update_tab_properties()
+        self._send_requests(self._alter_dimensions_requests(nrows, ncols))
+        self._set_dimensions(nrows, ncols)
 
     def append_data(self, data, index=True, autoformat=True):
         """Append data to the existing data in this tab.
@@ -258,17 +493,17 @@ class Tab(object):
         """
         # Convert everything to lists of lists, which Google Sheets requires
         headers, values = helpers._make_list_of_lists(data, index)
-        values = helpers._convert_nan_and_datelike_values(values)
 
         body = {'values': values}
-        self.sheets_svc.values().append(spreadsheetId=self.workbook.file_id, range=self.tabname,
-                                        valueInputOption='USER_ENTERED', body=body).execute()
+        response = self._values_svc.append(spreadsheetId=self.workbook.file_id,
+                                           range=self.tabname,
+                                           valueInputOption='USER_ENTERED',
+                                           body=body).execute()
+        self._expand_to_fit(response.get('updates', {}).get('updatedRange'))
 
         if autoformat:
             self.autoformat(len(headers))
 
-        self._update_tab_properties()
-
     def autoformat(self, n_header_rows):
         """Apply default stylings to the tab
 
@@ -286,17 +521,12 @@ class Tab(object):
         Returns:
             None
         """
-        self.format_headers(nrows=n_header_rows)
-        self.format_font()
-        self.align_cells()
-        self.autosize_columns()
-
-        populated_cells = self.sheets_svc.values().get(spreadsheetId=self.workbook.file_id,
-                                                       range=self.tabname).execute()
+        populated_cells = self._values_svc.get(spreadsheetId=self.workbook.file_id,
+                                               range=self.tabname,
+                                               fields='values').execute()
         nrows = len(populated_cells['values'])
         ncols = max(map(len, populated_cells['values']))
-        self.alter_dimensions(nrows=nrows, ncols=ncols)
-        self._update_tab_properties()
+        self._autoformat(n_header_rows, nrows, ncols)
 
     def autosize_columns(self):
         """Resize the widths of all columns in the tab to fit their data
@@ -304,17 +534,49 @@ class Tab(object):
         Returns:
             None
         """
-        request_body = {'autoResizeDimensions': {
-                            'dimensions': {
-                                  'sheetId': self.tab_id,
-                                  'dimension': 'COLUMNS',
-                                  'startIndex': 0,
-                                  'endIndex': self.ncols
-                                  }
-                            }
-                        }
-        body = {'requests': [request_body]}
-        self.workbook.batch_update(body)
+        self._send_requests(self._autosize_columns_requests())
+
+    @contextlib.contextmanager
+    def batched(self):
+        """Combine the formatting and dimension changes made within a block into one request
+
+        Each formatting or dimension change (e.g. align_cells, add_rows, format_font) is normally
+        sent to Google Sheets on its own. Within this block they are instead collected and sent
+        together in a single batchUpdate request, in the order they were made, when the block
+        exits. If the block raises an exception, or sending the changes fails, the collected
+        changes are discarded and the tab's properties (e.g. nrows) are fetched again.
+
+        Data reads and writes (e.g. fetch_data, insert_data) are not deferred and take effect
+        immediately.
+
+        Example:
+            >>> with tab.batched():
+            ...     tab.align_cells()
+            ...     tab.autosize_columns()
+            ...     tab.format_font(size=12)
+
+        Returns:
+            datasheets.Tab: This tab, for use within the block
+        """
+        if self._pending_requests is not None:
+            # Already batching, so let the outermost block send everything
+            yield self
+            return
+
+        self._pending_requests = []
+        applied = False
+        try:
+            yield self
+            if self._pending_requests:
+                self.workbook.batch_update({'requests': self._pending_requests})
+            applied = True
+        finally:
+            self._pending_requests = None
+            if not applied:
+                # Methods update the cached properties as changes are made, but those changes were
+                # never applied. Data writes within the block may still have grown the tab, so
+                # rather than guess, fetch the tab's actual properties
+                self._update_tab_properties()
 
     def clear_data(self):
         """Clear all data from the tab while leaving formatting intact
@@ -322,9 +584,9 @@ class Tab(object):
         Returns:
             None
         """
-        self.sheets_svc.values().clear(spreadsheetId=self.workbook.file_id,
-                                       range=self.tabname,
-                                       body={}).execute()
+        self._values_svc.clear(spreadsheetId=self.workbook.file_id,
+                               range=self.tabname,
+                               body={}).execute()
 
     def format_font(self, font='Proxima Nova', size=10):
         """Set the font and size for all cells in the tab
@@ -336,21 +598,7 @@ class Tab(object):
         Returns:
             None
         """
-        request_body = {'repeatCell': {
-                            'range': {'sheetId': self.tab_id},
-                            'cell': {
-                                'userEnteredFormat': {
-                                    'textFormat': {
-                                        'fontSize': size,
-                                        'fontFamily': font
-                                        }
-                                    }
-                                },
-                            'fields': 'userEnteredFormat(textFormat(fontSize,fontFamily))'
-                            }
-                        }
-        body = {'requests': [request_body]}
-        self.workbook.batch_update(body)
+        self._send_requests(self._format_font_requests(font, size))
 
     def format_headers(self, nrows):
         """Format the first n rows of a tab.
@@ -368,54 +616,10 @@ class Tab(object):
         Returns:
             None
         """
-        body = {
-          'requests': [
-            {
-              'repeatCell': {
-                'range': {
-                  'sheetId': self.tab_id,
-                  'startRowIndex': 0,
-                  'endRowIndex': nrows
-                },
-                'cell': {
-                  'userEnteredFormat': {
-                    'backgroundColor': {
-                      'red': 0.26274511,
-                      'green': 0.26274511,
-                      'blue': 0.26274511
-                    },
-                    'horizontalAlignment': 'LEFT',
-                    'textFormat': {
-                      'foregroundColor': {
-                        'red': 0.95294118,
-                        'green': 0.95294118,
-                        'blue': 0.95294118
-                      },
-                      'fontSize': 10,
-                      'fontFamily': 'Proxima Nova',
-                      'bold': False
-                    }
-                  }
-                },
-                'fields': 'userEnteredFormat(backgroundColor,textFormat,horizontalAlignment)'
-              }
-            },
-            {
-              'updateSheetProperties': {
-                'properties': {
-                  'sheetId': self.tab_id,
-                  'gridProperties': {
-                    'frozenRowCount': nrows
-                  }
-                },
-                'fields': 'gridProperties(frozenRowCount)'
-              }
-            }
-          ]
-        }
-        self.workbook.batch_update(body)
+        self._send_requests(self._format_headers_requests(nrows))
+        self.properties['gridProperties']['frozenRowCount'] = nrows
 
-    def fetch_data(self, headers=True, fmt='df'):
+    def fetch_data(self, headers=True, fmt='df', typed=True):
         """Retrieve the data within this tab.
 
         Efforts are taken to ensure that returned rows are always the same length. If
@@ -432,6 +636,13 @@ class Tab(object):
 
             fmt (str): The format in which to return the data. Accepted values: 'df', 'dict', 'list'
 
+            typed (bool): If True, each cell's number format is fetched as well and used to
+                convert its value, e.g. cells formatted as dates become datetime.date objects.
+                If False, only the cells' values are fetched, which is considerably faster for
+                large tabs. Numbers are still returned as numbers, but dates and times are
+                returned as serial numbers (the number of days since 1899-12-30) and cells
+                containing errors are returned as their error strings (e.g. '#DIV/0!')
+
         Returns:
             When fmt='df' --> pandas.DataFrame
 
@@ -446,50 +657,7 @@ class Tab(object):
                 ([header1, header2, ...],
                  [[row1cell1, row1cell2, ...], [row2cell1, row2cell2, ...], ...])
         """
-        if fmt not in ('df', 'dict', 'list'):
-            raise ValueError("Unexpected value '{}' for parameter `fmt`. "
-                             "Accepted values are 'df', 'dict', and 'list'".format(fmt))
-
-        fields = 'sheets/data/rowData/values(effectiveValue,effectiveFormat/numberFormat/type)'
-        raw_data = self.sheets_svc.get(spreadsheetId=self.workbook.file_id, ranges=self.tabname,
-                                       includeGridData=True, fields=fields).execute()
-        processed_rows = self._process_rows(raw_data)
-
-        # filter out empty rows
-        max_idx = helpers._find_max_nonempty_row(processed_rows)
-
-        if max_idx is None:
-            if fmt == 'df':
-                return pd.DataFrame([])
-            elif fmt == 'dict':
-                return []
-            else:
-                return ([], [])
-
-        processed_rows = processed_rows[:max_idx+1]
-
-        # remove trailing Nones on rows
-        processed_rows = list(map(helpers._remove_trailing_nones, processed_rows))
-
-        if headers:
-            header_names = processed_rows.pop(0)
-            max_width = len(header_names)
-        else:
-            # Iterate through rows to find widest one
-            max_width = max(map(len, processed_rows))
-            header_names = list(range(max_width))
-
-        # resize the rows to match the number of column headers
-        processed_rows = [helpers._resize_row(row, max_width) for row in processed_rows]
-
-        if fmt == 'df':
-            df = pd.DataFrame(data=processed_rows, columns=header_names)
-            return df
-        elif fmt == 'dict':
-            make_row_dict = lambda row: OrderedDict(zip(header_names, row))
-            return list(map(make_row_dict, processed_rows))
-        else:
-            return header_names, processed_rows
+        return self._fetch_data(headers=headers, fmt=fmt, typed=typed)
 
     def insert_data(self, data, index=True, autoformat=True):
         """Overwrite all data in this tab with the provided data.
@@ -513,13 +681,27 @@ class Tab(object):
 
         values = headers + values  # Include headers for inserts but not for appends
         self.clear_data()
-        values = helpers._convert_nan_and_datelike_values(values)
 
         body = {'values': values}
-        self.sheets_svc.values().update(spreadsheetId=self.workbook.file_id, range=self.tabname,
-                                        valueInputOption='USER_ENTERED', body=body).execute()
+        response = self._values_svc.update(spreadsheetId=self.workbook.file_id,
+                                           range=self.tabname,
+                                           valueInputOption='USER_ENTERED',
+                                           body=body).execute()
+        self._expand_to_fit(response.get('updatedRange'))
 
         if autoformat:
-            self.autoformat(len(headers))
+            # The tab holds exactly the data just written, so there's no need to fetch it again
+            # to learn which cells are populated
+            nrows, ncols = helpers._find_populated_extent(values)
+            self._autoformat(len(headers), nrows, ncols)
+
+    def refresh(self):
+        """Fetch this tab's properties (e.g. its dimensions) from Google Sheets again
+
+        The properties are kept up to date as this tab is modified through datasheets, so this
+        is only needed if the tab may have been changed by someone or something else.
 
+        Returns:
+            None
+        """
         self._update_tab_properties()
@@ -1,11 +1,40 @@
-import types
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 import pandas as pd
 
-from datasheets import exceptions
+from datasheets import exceptions, helpers
 from datasheets.tab import Tab
 
+# Google Drive accepts at most 100 calls in a single batch request
+_MAX_BATCH_SIZE = 100
+# Thread pools used by fetch_tabs_data(), keyed on process ID and number of threads. Pools are
+# reused so that their threads keep their HTTP connections (and TLS sessions) open between calls
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
 
+
+def _get_thread_pool(size):
+    """Return a thread pool with the given number of threads, creating it on first use
+
+    Args:
+        size (int): The number of threads in the pool
+
+    Returns:
+        multiprocessing.pool.ThreadPool: The pool
+    """
+    # Keying on the process ID ensures a forked process doesn't use its parent's threads, which
+    # don't exist in the child
+    key = (os.getpid(), size)
+    with _thread_pools_lock:
+        if key not in _thread_pools:
+            _thread_pools[key] = ThreadPool(size)
+        return _thread_pools[key]
+
+
+@helpers._refresh_token_on_public_calls
 class Workbook(object):
     def __init__(self, filename, file_id, client, drive_svc, sheets_svc):
         """Create a datasheets.Workbook instance of an existing Google Sheets doc
@@ -29,24 +58,8 @@ class Workbook(object):
         self.drive_svc = drive_svc
         self.sheets_svc = sheets_svc
         self.url = 'https://docs.google.com/spreadsheets/d/{}'.format(self.file_id)
-
-    def __getattribute__(self, attr):
-        """Get an attribute (variable or method) of this instance of this class
-
-        For client OAuth, before each user-facing method call this method will verify that the
-        access token is not expired and refresh it if it is.
-
-        We only refresh on user-facing method calls since otherwise we'd be refreshing multiple
-        times per user action (once for the user call, possibly multiple times for the private
-        method calls invoked by it).
-        """
-        requested_attr = super(Workbook, self).__getattribute__(attr)
-
-        if isinstance(requested_attr, types.MethodType) \
-           and not attr.startswith('_'):
-            self.client._refresh_token_if_needed()
-
-        return requested_attr
+        # The ID of each tab keyed on tab name, cached until the workbook is next updated
+        self._tab_ids = None
 
     def __repr__(self):
         msg = "<{module}.{name}(filename='{filename}')>"
@@ -59,19 +72,26 @@ class Workbook(object):
         """ Property for the client instance that instantiated this workbook """
         return self._client
 
+    @helpers._cached_property
+    def _permissions_svc(self):
+        """ The Drive service's permissions resource, which is costly to rebuild """
+        return self.drive_svc.permissions()
+
     def _fetch_permission_id(self, email):
         """ Return the permission_id associated with the given email address """
-        permissions = self.drive_svc.permissions().list(fileId=self.file_id).execute()
-        for perm in permissions.get('permissions', tuple()):
-            this_entry = self.drive_svc.permissions().get(fileId=self.file_id,
-                                                          permissionId=perm['id'],
-                                                          fields='emailAddress').execute()
-            if this_entry['emailAddress'] == email:
+        req = self._permissions_svc.list(fileId=self.file_id,
+                                         fields='permissions(id,emailAddress)')
+        for perm in req.execute().get('permissions', tuple()):
+            if perm.get('emailAddress') == email:
                 return perm['id']
 
         msg = "Permission for email '{}' not found for workbook '{}'"
         raise exceptions.PermissionNotFound(msg.format(email, self.filename))
 
+    def _refresh_token_if_needed(self):
+        """ Refresh the client's access token if needed; see Client._refresh_token_if_needed """
+        self.client._refresh_token_if_needed()
+
     def share(self, email, role='reader', notify=True, message=None):
         """Share this workbook with someone.
 
@@ -90,15 +110,62 @@ class Workbook(object):
         Returns:
             None
         """
+        self._build_share_request(email, role, notify, message).execute()
+
+    def _build_share_request(self, email, role, notify, message):
+        """ Return the (unexecuted) request that shares this workbook with the given email """
         new_permission = {
             'emailAddress': email,
             'type': 'user',
             'role': role
         }
-        self.drive_svc.permissions().create(fileId=self.file_id,
+        return self._permissions_svc.create(fileId=self.file_id,
                                             body=new_permission,
                                             emailMessage=message,
-                                            sendNotificationEmail=notify).execute()
+                                            sendNotificationEmail=notify)
+
+    def share_many(self, emails, role='reader', notify=True, message=None):
+        """Share this workbook with multiple people at once.
+
+        This is equivalent to calling share() once per email address, except that the
+        permissions are sent to Google Drive in batch requests of up to 100 permissions each,
+        taking one HTTP round trip per batch rather than one per email address.
+
+        Args:
+            emails (str or tuple): The email address(es) to share the workbook with. This may be
+                one address in string form or a series of addresses in tuple form
+
+            role (str or tuple): The type of permission(s) to grant. This can be either a tuple of
+                the same size as `emails` or a single value, in which case all emails are granted
+                that permission level. Values must be one of 'owner', 'writer', or 'reader'
+
+            notify (bool): If True, send an email notifying the recipient(s) of their granted
+                permissions.  These notification emails are the same as what Google sends when a
+                document is shared through Google Drive
+
+            message (str): If notify is True, the message to send with the email notification
+
+        Returns:
+            None
+        """
+        emails = [emails] if isinstance(emails, str) else list(emails)
+        roles = [role] * len(emails) if isinstance(role, str) else list(role)
+
+        errors = []
+
+        def collect_errors(request_id, response, exception):
+            if exception is not None:
+                errors.append(exception)
+
+        for start in range(0, len(emails), _MAX_BATCH_SIZE):
+            batch = self.drive_svc.new_batch_http_request(callback=collect_errors)
+            end = start + _MAX_BATCH_SIZE
+            for this_email, this_role in zip(emails[start:end], roles[start:end]):
+                batch.add(self._build_share_request(this_email, this_role, notify, message))
+            batch.execute()
+
+        if errors:
+            raise errors[0]
 
     def batch_update(self, body):
         """Apply updates to a workbook or tab using Google Sheets' spreadsheets.batchUpdate method
@@ -141,8 +208,14 @@ class Workbook(object):
                 }
                 body = {'requests': [request_body]}
 
+
+        Returns:
+            dict: The response from Google Sheets, which includes one reply per request
         """
-        self.sheets_svc.batchUpdate(spreadsheetId=self.file_id, body=body).execute()
+        response = self.sheets_svc.batchUpdate(spreadsheetId=self.file_id, body=body).execute()
+        # The update may have added, removed, or renamed tabs
+        self._tab_ids = None
+        return response
 
     def create_tab(self, tabname, nrows=1000, ncols=26):
         """Create a new tab in the given workbook
@@ -159,19 +232,22 @@ class Workbook(object):
         Returns:
             datasheets.Tab: An instance of the newly created tab
         """
-        request_body = {'addSheet': {
-                            'properties': {
-                                  'title': tabname,
-                                  'gridProperties': {
-                                        'rowCount': nrows,
-                                        'columnCount': ncols
-                                        },
-                                  }
-                            }
-                        }
-        body = {'requests': [request_body]}
-        self.batch_update(body=body)
-        return self.fetch_tab(tabname)
+        body = {'requests': [self._create_tab_request(tabname, nrows, ncols)]}
+        response = self.batch_update(body=body)
+        return self._tab_from_reply(tabname, response['replies'][0])
+
+    def _create_tab_request(self, tabname, nrows, ncols):
+        """ Build the batchUpdate request for create_tab() """
+        return {'addSheet': {
+                    'properties': {
+                          'title': tabname,
+                          'gridProperties': {
+                                'rowCount': nrows,
+                                'columnCount': ncols
+                                },
+                          }
+                    }
+                }
 
     def delete_tab(self, tabname):
         """Delete a tab with the given name from the current workbook
@@ -182,11 +258,70 @@ class Workbook(object):
         Returns:
             None
         """
-        tab_id = self.fetch_tab(tabname).tab_id
-        request_body = {'deleteSheet': {'sheetId': tab_id}}
-        body = {'requests': [request_body]}
+        body = {'requests': [self._delete_tab_request(tabname)]}
         self.batch_update(body=body)
 
+    def _delete_tab_request(self, tabname):
+        """ Build the batchUpdate request for delete_tab() """
+        return {'deleteSheet': {'sheetId': self._get_tab_id(tabname, refresh=True)}}
+
+    def _fetch_tab_ids(self):
+        """ Fetch the ID of each tab in the workbook, keyed on tab name, and cache them """
+        workbook = self.sheets_svc.get(spreadsheetId=self.file_id,
+                                       fields='sheets/properties(sheetId,title)').execute()
+        self._tab_ids = OrderedDict((tab['properties']['title'], tab['properties']['sheetId'])
+                                    for tab in workbook['sheets'])
+        return self._tab_ids
+
+    def _get_tab_id(self, tabname, refresh=False):
+        """ Return the ID of the given tab, only fetching tab IDs if they aren't cached
+
+        Cached IDs can go stale if tabs are renamed or recreated elsewhere, so anything that
+        modifies a tab by ID (e.g. deleting it) should pass refresh=True.
+        """
+        tab_ids = self._tab_ids
+        if refresh or tab_ids is None or tabname not in tab_ids:
+            tab_ids = self._fetch_tab_ids()
+        try:
+            return tab_ids[tabname]
+        except KeyError:
+            raise exceptions.TabNotFound("Tab '{}' could not be found in workbook '{}'".format(
+                tabname, self.filename))
+
+    def _replace_tab(self, old_tabname, tabname, nrows=1000, ncols=26):
+        """Create a new tab and delete an existing one in a single batchUpdate request
+
+        Args:
+            old_tabname (str): The name of the tab to delete
+            tabname (str): The name for the new tab
+            nrows (int): An integer number of rows for the new tab to have
+            ncols (int): An integer number of columns for the new tab to have
+
+        Returns:
+            datasheets.Tab: An instance of the newly created tab
+        """
+        # The new tab is added first since Google Sheets won't delete a workbook's only tab
+        body = {'requests': [self._create_tab_request(tabname, nrows, ncols),
+                             self._delete_tab_request(old_tabname)]}
+        response = self.batch_update(body=body)
+        return self._tab_from_reply(tabname, response['replies'][0])
+
+    def _tab_from_reply(self, tabname, reply):
+        """Return a datasheets.Tab instance of a tab created by an addSheet request
+
+        The reply to the addSheet request includes the new tab's properties, so there is no need
+        to fetch them again as fetch_tab() would.
+
+        Args:
+            tabname (str): The name of the new tab
+            reply (dict): The reply to the addSheet request that created the tab
+
+        Returns:
+            datasheets.Tab: An instance of the newly created tab
+        """
+        return Tab(tabname, self, self.drive_svc, self.sheets_svc,
+                   properties=reply['addSheet']['properties'])
+
     def fetch_tab(self, tabname):
         """Return a datasheets.Tab instance of the given tab associated with this workbook
 
@@ -199,6 +334,36 @@ class Workbook(object):
         """
         return Tab(tabname, self, self.drive_svc, self.sheets_svc)
 
+    def fetch_tabs_data(self, tabnames, headers=True, fmt='df', typed=True, max_workers=8):
+        """Retrieve the data within several tabs of this workbook at once
+
+        The tabs are fetched concurrently, so this takes roughly as long as fetching the largest
+        of them rather than as long as fetching each of them in turn.
+
+        Args:
+            tabnames (list): The names of the tabs to fetch data from
+            headers (bool): Passed to datasheets.Tab.fetch_data() for each tab
+            fmt (str): Passed to datasheets.Tab.fetch_data() for each tab
+            typed (bool): Passed to datasheets.Tab.fetch_data() for each tab
+            max_workers (int): The maximum number of tabs to fetch at the same time
+
+        Returns:
+            list: The data within each tab, in the same order as tabnames
+        """
+        if not tabnames:
+            return []
+
+        # The access token was refreshed when this method was called, so the threads use private
+        # methods that don't check it again; otherwise several threads could refresh the same
+        # credentials at once
+        def fetch_data(tabname):
+            tab = Tab(tabname, self, self.drive_svc, self.sheets_svc)
+            return tab._fetch_data(headers=headers, fmt=fmt, typed=typed)
+
+        # Each thread gets its own HTTP connection from the client, so requests can safely
+        # be made in parallel
+        return _get_thread_pool(max_workers).map(fetch_data, tabnames)
+
     def unshare(self, email):
         """Unshare this workbook with someone.
 
@@ -209,37 +374,56 @@ class Workbook(object):
             None
         """
         permission_id = self._fetch_permission_id(email)
-        self.drive_svc.permissions().delete(fileId=self.file_id,
-                                            permissionId=permission_id).execute()
+        self._permissions_svc.delete(fileId=self.file_id,
+                                     permissionId=permission_id).execute()
 
-    def fetch_tab_names(self):
+    def fetch_tab_names(self, fmt='df'):
         """Show the names of the tabs within the workbook, returned as a pandas.DataFrame.
 
+        Args:
+            fmt (str): The format in which to return the names. Accepted values: 'df', 'list'
+
         Returns:
-            pandas.DataFrame: One row per tabname within the workbook
+            When fmt='df' --> pandas.DataFrame: One row per tabname within the workbook
+
+            When fmt='list' --> list: The tabnames within the workbook
         """
-        workbook = self.sheets_svc.get(spreadsheetId=self.file_id,
-                                       fields='sheets/properties/title').execute()
-        tab_names = [tab['properties']['title'] for tab in workbook['sheets']]
+        if fmt not in ('df', 'list'):
+            raise ValueError("Unexpected value '{}' for parameter `fmt`. "
+                             "Accepted values are 'df' and 'list'".format(fmt))
+
+        tab_names = list(self._fetch_tab_ids())
+        if fmt == 'list':
+            return tab_names
         return pd.DataFrame(tab_names, columns=['Tabs'])
 
-    def fetch_permissions(self):
+    def fetch_permissions(self, fmt='df'):
         """Fetch information on who is shared on this workbook and their permission level
 
+        Args:
+            fmt (str): The format in which to return the permissions. Accepted values: 'df', 'dict'
+
         Returns:
-            pandas.DataFrame: One row per email address shared, including the permission level
-            that that email has been granted
+            When fmt='df' --> pandas.DataFrame: One row per email address shared, including the
+            permission level that that email has been granted
+
+            When fmt='dict' --> list of dicts, one per email address shared, e.g.::
+
+                [{'email': email1, 'role': role1},
+                 {'email': email2, 'role': role2},
+                 ...]
         """
-        req = self.drive_svc.permissions().list(fileId=self.file_id,
-                                                fields='permissions(id,role,type)')
+        if fmt not in ('df', 'dict'):
+            raise ValueError("Unexpected value '{}' for parameter `fmt`. "
+                             "Accepted values are 'df' and 'dict'".format(fmt))
+
+        req = self._permissions_svc.list(fileId=self.file_id,
+                                         fields='permissions(role,type,emailAddress)')
         perm_ids = req.execute()['permissions']
 
         permissions = []
         for perm in perm_ids:
-            email = self.drive_svc.permissions().get(
-                fileId=self.file_id, permissionId=perm['id'],
-                fields='emailAddress').execute().get('emailAddress')
-
+            email = perm.get('emailAddress')
             if not email:
                 email = "User Type: '{}'".format(perm['type'])
 
@@ -248,4 +432,6 @@ class Workbook(object):
                 email=email
             ))
 
-        return pd.DataFrame(data=permissions)
+        if fmt == 'dict':
+            return permissions
+        return pd.DataFrame(data=permissions, columns=['email', 'role'])
@@ -20,6 +20,7 @@ def get_version():
 
 required = [
     'google_auth',
+    'google-auth-httplib2',
     'google_auth_oauthlib',
     'pandas',
     'numpy',
@@ -36,6 +37,7 @@ setup(
     url='https://github.com/Squarespace/datasheets',
     download_url='https://github.com/Squarespace/datasheets/tarball/{}'.format(get_version()),
     packages=['datasheets'],
+    package_data={'datasheets': ['discovery/*.json']},
     install_requires=required,
     license='Apache License 2.0',
     classifiers=[
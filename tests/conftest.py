@@ -34,7 +34,7 @@ def build_path(path):
 def get_data_from_yaml(path):
     filepath = build_path(path)
     with open(filepath, 'r') as f:
-        return yaml.load(f)
+        return yaml.safe_load(f)
 
 
 @pytest.fixture(scope='session')
@@ -58,8 +58,9 @@ def sheets_svc():
 def mock_client(mocker, drive_svc, sheets_svc):
     mocker.patch('datasheets.Client._authenticate')
     mocker.patch('datasheets.Client.credentials', create=True)
-    mocker.patch('apiclient.discovery.build', autospec=True,
-                 side_effect=[drive_svc, sheets_svc])
+    services = {'drive': drive_svc, 'sheets': sheets_svc}
+    mocker.patch('datasheets.Client._build_service', autospec=True,
+                 side_effect=lambda self, api, version: services[api])
     mocker.patch('datasheets.Client._refresh_token_if_needed')
 
     client = datasheets.Client()
@@ -1,5 +1,7 @@
+import datetime as dt
 import json
 import os
+import threading
 
 import apiclient
 import pandas as pd
@@ -41,7 +43,74 @@ def test_init(mock_client):
     assert repr(mock_client).startswith(repr_start)
 
 
-def test_getattribute_for_non_method(mock_client):
+def test_init_builds_services_lazily(mocker):
+    mocker.patch.object(datasheets.Client, '_authenticate')
+    mocker.patch.object(datasheets.Client, '_refresh_token_if_needed')
+    mocked_build = mocker.patch('apiclient.discovery.build_from_document', autospec=True)
+
+    client = datasheets.Client()
+    assert mocked_build.call_count == 0
+
+    drive_svc = client.drive_svc
+    assert client.drive_svc is drive_svc
+    assert mocked_build.call_count == 1
+
+    client.sheets_svc
+    assert mocked_build.call_count == 2
+
+    # Both services share a single transport
+    for _, kwargs in mocked_build.call_args_list:
+        assert kwargs['http'] is client._http
+
+
+@pytest.mark.parametrize('api,version,resources', [
+    ('drive', 'v3', ('files', 'permissions')),
+    ('sheets', 'v4', ('spreadsheets',)),
+])
+def test_build_service_from_bundled_discovery_doc(mocker, api, version, resources):
+    mocker.patch.object(datasheets.Client, '__init__', return_value=None)
+    client = datasheets.Client()
+    client._http = apiclient.http.HttpMock()
+
+    service = client._build_service(api, version)
+
+    assert isinstance(service, apiclient.discovery.Resource)
+    for resource in resources:
+        assert hasattr(service, resource)
+
+
+def test_build_service_parses_discovery_doc_once(mocker):
+    mocker.patch.dict(datasheets.client._discovery_docs, clear=True)
+    mocked_json_load = mocker.patch('datasheets.client.json.load', wraps=json.load)
+    mocker.patch.object(datasheets.Client, '__init__', return_value=None)
+
+    for _ in range(2):
+        client = datasheets.Client()
+        client._http = apiclient.http.HttpMock()
+        service = client._build_service('drive', 'v3')
+        assert hasattr(service, 'files')
+
+    assert mocked_json_load.call_count == 1
+
+
+def test_thread_local_http_uses_one_transport_per_thread():
+    created = []
+    factory = lambda: created.append(object()) or created[-1]
+    http = datasheets.client._ThreadLocalHttp(factory)
+
+    main_thread_http = http._http
+    assert http._http is main_thread_http
+
+    other_thread_http = []
+    thread = threading.Thread(target=lambda: other_thread_http.append(http._http))
+    thread.start()
+    thread.join()
+
+    assert len(created) == 2
+    assert other_thread_http[0] is not main_thread_http
+
+
+def test_refresh_token_not_called_for_non_method(mock_client):
     mock_client.credentials = 'foo'
     # Also make sure we actually get something back from the non-method call
     assert mock_client.email == 'test@email.com'
@@ -49,21 +118,65 @@ def test_getattribute_for_non_method(mock_client):
     assert mock_client._refresh_token_if_needed.call_count == 1
 
 
-def test_getattribute_for_private_method(mock_client):
+def test_refresh_token_not_called_for_private_method(mock_client):
     mock_client.credentials = 'foo'
     assert mock_client._authenticate()
     # _refresh_token_if_needs is called in __init__(); verify it wasn't called again
     assert mock_client._refresh_token_if_needed.call_count == 1
 
 
-def test_getattribute_for_user_facing_method_with_credentials(mocker, mock_client):
+def test_refresh_token_called_for_user_facing_method(mock_client):
     mock_client.credentials = 'foo'
-    mocker.patch.object(mock_client, 'fetch_workbook', return_value='foo')
-    mock_client.fetch_workbook()
+    mock_client.fetch_workbook(file_id='xyz1234')
     # _refresh_token_if_needs is called in __init__(); verify it was called a second time
     assert mock_client._refresh_token_if_needed.call_count == 2
 
 
+@pytest.fixture
+def bare_client(mocker):
+    mocker.patch.object(datasheets.Client, '__init__', return_value=None)
+    client = datasheets.Client()
+    client.is_service = False
+    client._token_valid_until = None
+    return client
+
+
+def test_refresh_token_if_needed_skips_checks_until_near_expiry(mocker, bare_client):
+    bare_client.credentials = mocker.Mock(expiry=dt.datetime.utcnow() + dt.timedelta(hours=1))
+
+    bare_client._refresh_token_if_needed()
+    bare_client._refresh_token_if_needed()
+
+    assert bare_client.credentials.refresh.call_count == 0
+    assert bare_client._token_valid_until == \
+        bare_client.credentials.expiry - dt.timedelta(seconds=60)
+
+
+def test_refresh_token_if_needed_near_expiry(mocker, bare_client):
+    bare_client.credentials = mocker.Mock(expiry=dt.datetime.utcnow() + dt.timedelta(seconds=30))
+
+    bare_client._refresh_token_if_needed()
+
+    assert bare_client.credentials.refresh.call_count == 1
+
+
+def test_refresh_token_if_needed_unknown_expiry(mocker, bare_client):
+    bare_client.credentials = mocker.Mock(expiry=None)
+
+    bare_client._refresh_token_if_needed()
+
+    assert bare_client.credentials.refresh.call_count == 1
+
+
+def test_refresh_token_if_needed_service_account(mocker, bare_client):
+    bare_client.is_service = True
+    bare_client.credentials = mocker.Mock(expired=True, expiry=None)
+
+    bare_client._refresh_token_if_needed()
+
+    assert bare_client.credentials.refresh.call_count == 0
+
+
 def test_fetch_file_id_findable_workbook(mocker, mock_client):
     mocked_fetch_info_on_items = mocker.patch.object(
         mock_client, '_fetch_info_on_items', autospec=True, return_value=[
@@ -77,7 +190,7 @@ def test_fetch_file_id_findable_workbook(mocker, mock_client):
 
     file_id = mock_client._fetch_file_id(filename='datasheets_test', kind='spreadsheet')
     assert file_id == 'xyz2345'
-    mocked_fetch_info_on_items.assert_called_once_with(kind='spreadsheet', name='datasheets_test')
+    mocked_fetch_info_on_items.assert_called_once_with(kind='spreadsheet', name='datasheets_test', limit=2)
 
 
 def test_fetch_file_id_findable_folder(mocker, mock_client):
@@ -93,7 +206,7 @@ def test_fetch_file_id_findable_folder(mocker, mock_client):
 
     file_id = mock_client._fetch_file_id(filename='datasheets_test_folder', kind='folder')
     assert file_id == 'xyz6789'
-    mocked_fetch_info_on_items.assert_called_once_with(kind='folder', name='datasheets_test_folder')
+    mocked_fetch_info_on_items.assert_called_once_with(kind='folder', name='datasheets_test_folder', limit=2)
 
 
 def test_fetch_file_id_workbook_not_found(mocker, mock_client):
@@ -104,7 +217,7 @@ def test_fetch_file_id_workbook_not_found(mocker, mock_client):
     with pytest.raises(datasheets.exceptions.WorkbookNotFound) as err:
         mock_client._fetch_file_id(filename='missing_file', kind='spreadsheet')
 
-    mocked_fetch_info_on_items.assert_called_once_with(kind='spreadsheet', name='missing_file')
+    mocked_fetch_info_on_items.assert_called_once_with(kind='spreadsheet', name='missing_file', limit=2)
     err_message = 'Workbook not found. Verify that it is shared with {}'.format(mock_client.email)
     assert err.match(err_message)
 
@@ -117,7 +230,7 @@ def test_fetch_file_id_folder_not_found(mocker, mock_client):
     with pytest.raises(datasheets.exceptions.FolderNotFound) as err:
         mock_client._fetch_file_id(filename='missing_folder', kind='folder')
 
-    mocked_fetch_info_on_items.assert_called_once_with(kind='folder', name='missing_folder')
+    mocked_fetch_info_on_items.assert_called_once_with(kind='folder', name='missing_folder', limit=2)
     err_message = 'Folder not found. Verify that it is shared with {}'.format(mock_client.email)
     assert err.match(err_message)
 
@@ -141,7 +254,7 @@ def test_fetch_file_id_with_duplicates(mocker, mock_client):
     with pytest.raises(datasheets.exceptions.MultipleWorkbooksFound) as err:
         mock_client._fetch_file_id(filename='duplicate_file', kind='spreadsheet')
 
-    mocked_fetch_info_on_items.assert_called_once_with(kind='spreadsheet', name='duplicate_file')
+    mocked_fetch_info_on_items.assert_called_once_with(kind='spreadsheet', name='duplicate_file', limit=2)
 
     # Rather than checking the whole message, just check that each component is there
     base_msg = ('Multiple workbooks founds. Please choose the correct file_id below '
@@ -154,6 +267,90 @@ def test_fetch_file_id_with_duplicates(mocker, mock_client):
     assert err.match('webViewLink')
 
 
+def test_fetch_file_id_reuses_recent_lookups(mocker, mock_client):
+    mocked_time = mocker.patch('datasheets.client.time.time', return_value=1000)
+    mocked_fetch_info_on_items = mocker.patch.object(
+        mock_client, '_fetch_info_on_items', autospec=True,
+        return_value=[{'id': 'xyz2345', 'name': 'datasheets_test'}]
+    )
+
+    for _ in range(3):
+        file_id = mock_client._fetch_file_id(filename='datasheets_test', kind='spreadsheet')
+        assert file_id == 'xyz2345'
+    assert mocked_fetch_info_on_items.call_count == 1
+
+    # Lookups are repeated once the cached value has expired
+    mocked_time.return_value = 1000 + datasheets.client._FILE_ID_CACHE_TTL
+    mock_client._fetch_file_id(filename='datasheets_test', kind='spreadsheet')
+    assert mocked_fetch_info_on_items.call_count == 2
+
+    # ...or once the cache has been cleared
+    mock_client.clear_file_cache()
+    mock_client._fetch_file_id(filename='datasheets_test', kind='spreadsheet')
+    assert mocked_fetch_info_on_items.call_count == 3
+
+
+def test_fetch_file_id_cache_is_bounded(mocker, mock_client):
+    mocker.patch('datasheets.client._FILE_ID_CACHE_SIZE', 2)
+    mocker.patch.object(mock_client, '_fetch_info_on_items', autospec=True,
+                        side_effect=lambda kind, name, limit: [{'id': name + '_id', 'name': name}])
+
+    for filename in ('file1', 'file2', 'file3'):
+        mock_client._fetch_file_id(filename=filename, kind='spreadsheet')
+
+    assert list(mock_client._file_id_cache) == [('spreadsheet', 'file2'), ('spreadsheet', 'file3')]
+
+
+def test_fetch_file_ids(mocker, mock_client):
+    mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
+    mocked_drive_svc.files().list().execute.return_value = {'files': [
+        {'id': 'xyz1234', 'name': 'folder1'},
+        {'id': 'xyz2345', 'name': "Test's folder"},
+    ]}
+
+    file_ids = mock_client._fetch_file_ids(['folder1', "Test's folder"], kind='folder')
+
+    assert file_ids == {'folder1': 'xyz1234', "Test's folder": 'xyz2345'}
+    _, _, kwargs = mocked_drive_svc.files().list.mock_calls[-2]
+    assert mocked_drive_svc.files().list().execute.call_count == 1
+    assert kwargs['q'].startswith("mimeType='application/vnd.google-apps.folder' and (")
+    assert "name = 'folder1'" in kwargs['q']
+    assert "name = 'Test\\'s folder'" in kwargs['q']
+
+
+def test_fetch_file_ids_uses_cache(mocker, mock_client):
+    mocker.patch('datasheets.client.time.time', return_value=1000)
+    mocker.patch.object(mock_client, '_fetch_info_on_items', autospec=True,
+                        return_value=[{'id': 'xyz1234', 'name': 'folder1'}])
+    mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
+    mocked_drive_svc.files().list().execute.return_value = {'files': [
+        {'id': 'xyz2345', 'name': 'folder2'},
+    ]}
+
+    mock_client._fetch_file_id(filename='folder1', kind='folder')
+    file_ids = mock_client._fetch_file_ids(['folder1', 'folder2'], kind='folder')
+
+    assert file_ids == {'folder1': 'xyz1234', 'folder2': 'xyz2345'}
+    # Only the name that wasn't cached is queried for
+    _, _, kwargs = mocked_drive_svc.files().list.mock_calls[-2]
+    assert "name = 'folder1'" not in kwargs['q']
+    assert "name = 'folder2'" in kwargs['q']
+
+    # ...and its result is cached in turn
+    assert mock_client._fetch_file_ids(['folder1', 'folder2'], kind='folder') == file_ids
+    assert mocked_drive_svc.files().list().execute.call_count == 1
+
+
+def test_fetch_file_ids_missing_folder(mocker, mock_client):
+    mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
+    mocked_drive_svc.files().list().execute.return_value = {'files': [
+        {'id': 'xyz1234', 'name': 'folder1'},
+    ]}
+
+    with pytest.raises(datasheets.exceptions.FolderNotFound):
+        mock_client._fetch_file_ids(['folder1', 'folder2'], kind='folder')
+
+
 def test_fetch_info_on_items(mocker, mock_client):
     mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
     mocked_drive_svc.files().list().execute.return_value = {}
@@ -171,6 +368,34 @@ def test_fetch_info_on_items(mocker, mock_client):
     )
 
 
+def test_fetch_info_on_items_multiple_pages(mocker, mock_client):
+    mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
+    mocked_drive_svc.files().list().execute.side_effect = [
+        {'files': [{'id': 'xyz1234'}], 'nextPageToken': 'abc'},
+        {'files': [{'id': 'xyz2345'}]},
+    ]
+
+    raw_info = mock_client._fetch_info_on_items(kind='spreadsheet')
+
+    assert raw_info == [{'id': 'xyz1234'}, {'id': 'xyz2345'}]
+    _, _, kwargs = mocked_drive_svc.files().list.mock_calls[-2]
+    assert kwargs['pageToken'] == 'abc'
+
+
+def test_fetch_info_on_items_stops_paging_at_limit(mocker, mock_client):
+    mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
+    mocked_drive_svc.files().list().execute.side_effect = [
+        {'files': [{'id': 'xyz1234'}], 'nextPageToken': 'abc'},
+        {'files': [{'id': 'xyz2345'}, {'id': 'xyz3456'}], 'nextPageToken': 'def'},
+        {'files': [{'id': 'xyz4567'}]},
+    ]
+
+    raw_info = mock_client._fetch_info_on_items(kind='spreadsheet', limit=2)
+
+    assert raw_info == [{'id': 'xyz1234'}, {'id': 'xyz2345'}, {'id': 'xyz3456'}]
+    assert mocked_drive_svc.files().list().execute.call_count == 2
+
+
 def test_fetch_info_on_items_with_folder_name_and_only_mine(mocker, mock_client):
     mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc')
     mocked_drive_svc.files().list().execute.return_value = {}
@@ -210,6 +435,16 @@ def test_delete_workbook_which_exists(mocker, mock_client):
     assert result is None
 
 
+def test_delete_workbook_forgets_cached_file_id(mocker, mock_client):
+    mocker.patch.object(mock_client, 'drive_svc')
+    mock_client._file_id_cache[('spreadsheet', 'testfile')] = ('xyz1234', 0)
+    mock_client._file_id_cache[('spreadsheet', 'otherfile')] = ('xyz2345', 0)
+
+    mock_client.delete_workbook(file_id='xyz1234')
+
+    assert list(mock_client._file_id_cache) == [('spreadsheet', 'otherfile')]
+
+
 def test_delete_workbook_error_passing_filename_and_file_id(mock_client):
     with pytest.raises(ValueError) as err:
         mock_client.delete_workbook(filename='foo', file_id='bar')
@@ -309,6 +544,44 @@ def test_fetch_folders_all(mocker, mock_client):
     assert results.shape == (2, 4)
 
 
+def test_make_info_frame():
+    raw_info = [
+        {'id': 'xyz1234', 'name': 'workbook1', 'modifiedTime': '2018-04-07T17:35:16.895Z',
+         'webViewLink': 'https://docs.google.com/spreadsheets/d/xyz1234/edit?usp=drivesdk'},
+        {'id': 'xyz2345', 'name': 'workbook2', 'modifiedTime': '2018-04-06T15:10:04.566Z',
+         'webViewLink': 'https://docs.google.com/spreadsheets/d/xyz2345/edit?usp=drivesdk'},
+    ]
+
+    results = datasheets.client._make_info_frame(raw_info)
+
+    expected = pd.DataFrame(raw_info, columns=['name', 'id', 'modifiedTime', 'webViewLink'])
+    pd.testing.assert_frame_equal(results, expected)
+
+
+def test_make_info_frame_empty():
+    results = datasheets.client._make_info_frame([])
+
+    assert list(results.columns) == ['name', 'id', 'modifiedTime', 'webViewLink']
+    assert results.shape == (0, 4)
+
+
+@pytest.mark.usefixtures('clear_envvars')
+def test_resolve_path(mocker):
+    default = '~/.datasheets/test_resolve_path.json'
+    expected_default = os.path.expanduser(default)
+    expanduser = mocker.spy(os.path, 'expanduser')
+
+    assert datasheets.client._resolve_path('DATASHEETS_TEST_PATH', default) == expected_default
+
+    os.environ['DATASHEETS_TEST_PATH'] = '/tmp/test_resolve_path.json'
+    assert datasheets.client._resolve_path('DATASHEETS_TEST_PATH', default) == \
+        '/tmp/test_resolve_path.json'
+
+    # Each distinct path is only expanded once
+    datasheets.client._resolve_path('DATASHEETS_TEST_PATH', default)
+    assert expanduser.call_count == 2
+
+
 @pytest.mark.usefixtures('clear_envvars')
 def test_get_service_credentials_envvar_set(mocker, tmpdir):
     """
@@ -341,6 +614,27 @@ def test_get_service_credentials_envvar_set(mocker, tmpdir):
     assert client.email == 'datasheets-service@datasheets-etl.iam.gserviceaccount.com'
 
 
+def test_load_service_credentials_parses_key_once(mocker, tmpdir):
+    file_path = tmpdir.join('service_key.json')
+    file_path.write('{"client_email": "datasheets-service@datasheets-etl.iam.gserviceaccount.com"}')
+    from_info = mocker.patch.object(service_credentials, 'from_service_account_info')
+
+    first = datasheets.client._load_service_credentials(file_path.strpath)
+    second = datasheets.client._load_service_credentials(file_path.strpath)
+
+    assert first is second
+    from_info.assert_called_once_with(
+        {'client_email': 'datasheets-service@datasheets-etl.iam.gserviceaccount.com'},
+        scopes=['https://www.googleapis.com/auth/drive']
+    )
+
+    # Replacing the key file means the credentials are rebuilt
+    mtime = os.path.getmtime(file_path.strpath)
+    os.utime(file_path.strpath, (mtime + 10, mtime + 10))
+    datasheets.client._load_service_credentials(file_path.strpath)
+    assert from_info.call_count == 2
+
+
 @pytest.mark.usefixtures('clear_envvars')
 def test_fetch_new_client_credentials_envvar_set(mocker, tmpdir):
     # Use a non-standard filename and file ending to ensure they work
@@ -472,8 +766,11 @@ def test_create_workbook_with_folder(mocker, mock_client):
     root_id = '0AP2cy554S5hyUk9PVA'
     mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc', autospec=True)
     mocked_drive_svc.files().get().execute.return_value = {'id': root_id}
+    mocked_fetch_file_ids = mocker.patch.object(
+        mock_client, '_fetch_file_ids', autospec=True, return_value={foldername: folder_id}
+    )
     mocked_fetch_file_id = mocker.patch.object(
-        mock_client, '_fetch_file_id', autospec=True, side_effect=[folder_id, file_id]
+        mock_client, '_fetch_file_id', autospec=True, return_value=file_id
     )
 
     workbook = mock_client.create_workbook(filename, folders=(foldername,))
@@ -481,9 +778,8 @@ def test_create_workbook_with_folder(mocker, mock_client):
     mocked_drive_svc.files().get.assert_called_with(fileId='root', fields='id')
     mocked_drive_svc.files().get().execute.assert_called_once()
 
-    assert mocked_fetch_file_id.call_count == 2
-    mocked_fetch_file_id.assert_any_call(filename=foldername, kind='folder')
-    mocked_fetch_file_id.assert_any_call(filename=filename, kind='spreadsheet')
+    mocked_fetch_file_ids.assert_called_once_with((foldername,), kind='folder')
+    mocked_fetch_file_id.assert_called_once_with(filename=filename, kind='spreadsheet')
 
     mocked_drive_svc.files().create.assert_called_once()
     _, _, kwargs = mocked_drive_svc.files().create.mock_calls[0]
@@ -501,8 +797,12 @@ def test_create_workbook_multiple_folders(mocker, mock_client):
     root_id = '0AP2cy554S5hyUk9PVA'
     mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc', autospec=True)
     mocked_drive_svc.files().get().execute.return_value = {'id': root_id}
+    mocked_fetch_file_ids = mocker.patch.object(
+        mock_client, '_fetch_file_ids', autospec=True,
+        return_value=dict(zip(foldernames, folder_ids))
+    )
     mocked_fetch_file_id = mocker.patch.object(
-        mock_client, '_fetch_file_id', autospec=True, side_effect=folder_ids + [file_id]
+        mock_client, '_fetch_file_id', autospec=True, return_value=file_id
     )
 
     workbook = mock_client.create_workbook(filename, folders=foldernames)
@@ -510,14 +810,27 @@ def test_create_workbook_multiple_folders(mocker, mock_client):
     mocked_drive_svc.files().get.assert_called_with(fileId='root', fields='id')
     mocked_drive_svc.files().get().execute.assert_called_once()
 
-    mocked_fetch_file_id.assert_any_call(filename=foldernames[0], kind='folder')
-    mocked_fetch_file_id.assert_any_call(filename=foldernames[1], kind='folder')
-    mocked_fetch_file_id.assert_any_call(filename=filename, kind='spreadsheet')
+    mocked_fetch_file_ids.assert_called_once_with(foldernames, kind='folder')
+    mocked_fetch_file_id.assert_called_once_with(filename=filename, kind='spreadsheet')
 
     mocked_drive_svc.files().create.assert_called_once()
     _, _, kwargs = mocked_drive_svc.files().create.mock_calls[0]
     assert kwargs['body']['name'] == filename
-    assert set(kwargs['body']['parents']) == set([root_id, folder_ids[0], folder_ids[1]])
+    assert kwargs['body']['parents'] == [root_id, folder_ids[0], folder_ids[1]]
 
     assert isinstance(workbook, datasheets.Workbook)
     assert workbook.file_id == file_id
+
+
+def test_create_workbook_fetches_root_file_id_once(mocker, mock_client):
+    root_id = '0AP2cy554S5hyUk9PVA'
+    mocked_drive_svc = mocker.patch.object(mock_client, 'drive_svc', autospec=True)
+    mocked_drive_svc.files().get().execute.return_value = {'id': root_id}
+    mocker.patch.object(mock_client, '_fetch_file_id', autospec=True, return_value='xyz1234')
+
+    mock_client.create_workbook('first_workbook')
+    mock_client.create_workbook('second_workbook')
+
+    mocked_drive_svc.files().get().execute.assert_called_once()
+    assert [c[2]['body']['parents'] for c in mocked_drive_svc.files().create.mock_calls
+            if c[2]] == [[root_id], [root_id]]
@@ -1,6 +1,18 @@
+import pytest
+
 import datasheets
 
 
+@pytest.fixture(autouse=True)
+def reset_default_client():
+    """ Make sure clients cached by one test aren't reused by the next """
+    datasheets.convenience._default_client_instance = None
+    datasheets.set_default_client(None)
+    yield
+    datasheets.convenience._default_client_instance = None
+    datasheets.set_default_client(None)
+
+
 def test_create_tab_in_existing_workbook_by_filename(mocker):
     mocked_client = mocker.patch('datasheets.convenience.Client', autospec=True)
 
@@ -27,8 +39,7 @@ def test_create_tab_in_new_workbook(mocker):
 
     mocked_client().create_workbook.assert_any_call('new_workbook')
     mocked_workbook = mocked_client().create_workbook('new_workbook')
-    mocked_workbook.delete_tab.assert_any_call('Sheet1')
-    mocked_workbook.create_tab.assert_any_call('new_tab')
+    mocked_workbook._replace_tab.assert_called_once_with('Sheet1', 'new_tab')
 
 
 def test_create_tab_in_new_workbook_share_with_emails_one_role(mocker):
@@ -40,12 +51,10 @@ def test_create_tab_in_new_workbook_share_with_emails_one_role(mocker):
 
     mocked_client().create_workbook.assert_any_call('new_workbook')
     mocked_workbook = mocked_client().create_workbook('new_workbook')
-    mocked_workbook.delete_tab.assert_any_call('Sheet1')
-    mocked_workbook.create_tab.assert_any_call('new_tab')
+    mocked_workbook._replace_tab.assert_called_once_with('Sheet1', 'new_tab')
 
-    for email in emails:
-        mocked_workbook.share.assert_any_call(email=email, message=None,
-                                              notify=False, role='writer')
+    mocked_workbook.share_many.assert_called_once_with(emails, role='writer', notify=False,
+                                                       message=None)
 
 
 def test_create_tab_in_new_workbook_share_with_emails_multiple_roles(mocker):
@@ -59,9 +68,27 @@ def test_create_tab_in_new_workbook_share_with_emails_multiple_roles(mocker):
 
     mocked_client().create_workbook.assert_any_call('new_workbook')
     mocked_workbook = mocked_client().create_workbook('new_workbook')
-    mocked_workbook.delete_tab.assert_any_call('Sheet1')
-    mocked_workbook.create_tab.assert_any_call('new_tab')
+    mocked_workbook._replace_tab.assert_called_once_with('Sheet1', 'new_tab')
+
+    mocked_workbook.share_many.assert_called_once_with(emails, role=roles, notify=True,
+                                                       message=message)
+
+
+def test_default_client_is_reused(mocker):
+    mocked_client = mocker.patch('datasheets.convenience.Client', autospec=True)
+
+    datasheets.convenience.create_tab_in_existing_workbook('existing_workbook', 'new_tab')
+    datasheets.convenience.create_tab_in_new_workbook('new_workbook', 'new_tab')
+
+    mocked_client.assert_called_once_with()
+
+
+def test_set_default_client(mocker):
+    mocked_client = mocker.patch('datasheets.convenience.Client', autospec=True)
+    my_client = mocker.Mock()
+    datasheets.set_default_client(my_client)
+
+    datasheets.convenience.create_tab_in_existing_workbook('existing_workbook', 'new_tab')
 
-    for email, role in zip(emails, roles):
-        mocked_workbook.share.assert_any_call(email=email, message=message,
-                                              notify=True, role=role)
+    assert mocked_client.call_count == 0
+    my_client.fetch_workbook.assert_called_once_with(filename='existing_workbook')
@@ -24,6 +24,18 @@ def test_find_max_nonempty_row(data, expected):
     assert expected == helpers._find_max_nonempty_row(data)
 
 
+@pytest.mark.parametrize("data, expected", [
+    ([[1, 'foo', 3], [2, 3, 4]], (2, 3)),
+    ([[1, 'foo'], [2, 3, 4, None], [5, '']], (3, 3)),
+    ([[1, None, 3], [None, None, None], []], (1, 3)),
+    ([[None, None], [0, False, '']], (2, 2)),
+    ([[None, ''], []], (0, 0)),
+    ([], (0, 0))
+    ])
+def test_find_populated_extent(data, expected):
+    assert expected == helpers._find_populated_extent(data)
+
+
 @pytest.mark.parametrize("item, expected", [
     ('foo', 'foo'),
     (2, 2),
@@ -32,14 +44,75 @@ def test_find_max_nonempty_row(data, expected):
     (dt.date(2016, 1, 1), '2016-01-01'),
     (dt.time(10, 20, 30), '10:20:30'),
     (dt.datetime(2016, 1, 1, 10, 20, 30), '2016-01-01 10:20:30'),
-    (np.nan, None)
+    (np.nan, None),
+    (np.float32('nan'), None),
+    (np.float32(1.5), np.float32(1.5)),
 ])
 def test_convert_nan_and_datelike_values(item, expected):
     assert [[expected]] == helpers._convert_nan_and_datelike_values([[item]])
 
 
+@pytest.mark.parametrize("values, expected", [
+    ([['foo', 2, True], [None, u'bar']], [['foo', 2, True], [None, u'bar']]),
+    ([['foo', 2, True], [np.nan, dt.date(2016, 1, 1)]], [['foo', 2, True], [None, '2016-01-01']]),
+])
+def test_convert_nan_and_datelike_values_rows(values, expected):
+    converted = helpers._convert_nan_and_datelike_values(values)
+    assert converted == expected
+    # The input is never modified, whether or not any conversion was needed
+    assert converted is not values and converted[0] is not values[0]
+
+
+@pytest.mark.parametrize("cell_format", ['DATE', 'TIME', 'DATE_TIME'])
+def test_convert_serial_numbers(cell_format):
+    values = [43000, 43000.5, 0.25, 1.75, 42369.999988426]
+    expected = [helpers._TYPE_CONVERSIONS[cell_format](x) for x in values]
+    assert helpers._convert_serial_numbers(values, cell_format) == expected
+
+
+def test_convert_serial_numbers_beyond_pandas_timestamp_range():
+    # pandas timestamps can't represent dates after 2262 but Google Sheets dates go up to 9999
+    assert helpers._convert_serial_numbers([2958465.5], 'DATE_TIME') == [dt.datetime(9999, 12, 31, 12)]
+    assert helpers._convert_serial_numbers([2958465.5], 'DATE') == [dt.date(9999, 12, 31)]
+
+
+@pytest.mark.parametrize("values, cell_format", [
+    ([3e6, 43000.5], 'DATE'), ([43000.5, -1e6], 'DATE_TIME'), ([1e300], 'DATE'),
+    ([0.25, -0.25], 'TIME')])
+def test_convert_serial_numbers_beyond_datetime_range(values, cell_format):
+    # Such values raise the same error as converting them one at a time, rather than becoming ints
+    with pytest.raises(OverflowError):
+        helpers._convert_serial_numbers(values, cell_format)
+    with pytest.raises(OverflowError):
+        helpers._convert_cell_values(values, cell_format)
+
+
+def test_convert_serial_numbers_time_beyond_datetime64_epoch_range():
+    # Times are taken from an offset to datetime.min, which supports larger serial numbers
+    values = [3e6 + 0.5, 0.25]
+    expected = [helpers._TYPE_CONVERSIONS['TIME'](x) for x in values]
+    assert helpers._convert_serial_numbers(values, 'TIME') == expected == [dt.time(12), dt.time(6)]
+
+
+@pytest.mark.parametrize("values, cell_format", [
+    ([1, 2.5, True], 'numberValue'), ([1, 2.5], 'PERCENT'), (['1.5', '2'], 'NUMBER'),
+    (['foo', 'bar'], 'stringValue'), ([1.5, 'foo'], 'TEXT'), ([43000, 43000.5], 'DATE'),
+    ([0.25], 'TIME'), ([43000.5], 'DATE_TIME'), ([{'a': 1}], None)])
+def test_convert_cell_values(values, cell_format):
+    expected = [helpers._TYPE_CONVERSIONS[cell_format](x) for x in values]
+    assert helpers._convert_cell_values(values, cell_format) == expected
+
+
+@pytest.mark.parametrize("values, cell_format, exception", [
+    ([1.5, 'foo'], 'NUMBER', ValueError), (['foo'], 'DATE', TypeError)])
+def test_convert_cell_values_invalid(values, cell_format, exception):
+    with pytest.raises(exception):
+        helpers._convert_cell_values(values, cell_format)
+
+
 @pytest.mark.parametrize("row, col, expected", [
-    (1, 1, 'A1'), (100, 27, 'AA100'), (7, 200, 'GR7')])
+    (1, 1, 'A1'), (100, 27, 'AA100'), (7, 200, 'GR7'), (3, 26, 'Z3'), (3, 52, 'AZ3'),
+    (5, 702, 'ZZ5'), (5, 703, 'AAA5')])
 def test_convert_cell_index_to_label(row, col, expected):
     assert expected == helpers.convert_cell_index_to_label(row, col)
 
@@ -52,7 +125,8 @@ def test_convert_cell_index_to_label_out_of_bounds(row, col):
 
 
 @pytest.mark.parametrize("label, expected", [
-    ('A1', (1, 1)), ('AA100', (100, 27)), ('GR7', (7, 200))])
+    ('A1', (1, 1)), ('AA100', (100, 27)), ('GR7', (7, 200)), ('gr7', (7, 200)), ('Z3', (3, 26)),
+    ('AAA5', (5, 703))])
 def test_convert_cell_label_to_index(label, expected):
     assert expected == helpers.convert_cell_label_to_index(label)
 
@@ -64,6 +138,18 @@ def test_convert_cell_label_to_index_not_parseable(label):
     assert err.match('Unable to parse user-provided label')
 
 
+def test_convert_cell_label_to_index_ignores_trailing_characters():
+    assert helpers.convert_cell_label_to_index('A1:B2') == (1, 1)
+    assert helpers.convert_cell_label_to_index('B3 ') == (3, 2)
+
+
+@pytest.mark.parametrize("label", ['1', 'AA', 'A1B', 'A1:B2', 'B3 '])
+def test_convert_exact_cell_label_to_index_not_parseable(label):
+    with pytest.raises(ValueError) as err:
+        helpers._convert_exact_cell_label_to_index(label)
+    assert err.match('Unable to parse user-provided label')
+
+
 def test_convert_cell_label_to_index_not_str():
     with pytest.raises(ValueError) as err:
         helpers.convert_cell_label_to_index(1)
@@ -76,6 +162,8 @@ def test_convert_cell_label_to_index_not_str():
     ("Quote'd text", "Quote\\'d text"),
     ("Backslashe\\d text", "Backslashe\\\\d text"),
     ("QuotedBackslashe\\'d text", "QuotedBackslashe\\\\\\'d text"),
+    (u"Caf\u00e9's r\u00e9sum\u00e9s", u"Caf\u00e9\\'s r\u00e9sum\u00e9s"),
+    ("''\\\\", "\\'\\'\\\\\\\\"),
 ])
 def test_escape_query(query, expected):
     assert helpers._escape_query(query) == expected
@@ -225,6 +313,36 @@ class TestMakeListOfLists:
         values = self.data
         assert helpers._make_list_of_lists(self.df_dual_multiidx_named, index=False) == (headers, values)
 
+    def test_df_values_made_serializable(self):
+        df = pd.DataFrame({'int': [1, 2],
+                           'float': [1.5, np.nan],
+                           'str': ['foo', None],
+                           'datetime': pd.to_datetime(['2016-01-01 10:20:30', None]),
+                           'date': [dt.date(2016, 1, 1), dt.date(2016, 1, 2)]},
+                          columns=['int', 'float', 'str', 'datetime', 'date'],
+                          index=pd.Index([dt.date(2017, 1, 1), dt.date(2017, 1, 2)], name='day'))
+        headers = [['day', 'int', 'float', 'str', 'datetime', 'date']]
+        values = [
+            ['2017-01-01', 1, 1.5, 'foo', '2016-01-01 10:20:30', '2016-01-01'],
+            ['2017-01-02', 2, None, None, 'NaT', '2016-01-02'],
+        ]
+        assert helpers._make_list_of_lists(df, index=True) == (headers, values)
+
+    def test_df_values_in_chunks(self):
+        df = pd.DataFrame({'int': range(5), 'float': [0.5, np.nan, 1.5, np.nan, 2.5]},
+                          columns=['int', 'float'])
+        chunks = list(helpers._iter_df_value_chunks(df, index=True, chunk_size=2))
+        assert chunks == [
+            [[0, 0, 0.5], [1, 1, None]],
+            [[2, 2, 1.5], [3, 3, None]],
+            [[4, 4, 2.5]],
+        ]
+
+    def test_list_values_made_serializable(self):
+        data = [[dt.date(2016, 1, 1), np.nan], [1, 'bar']]
+        headers, values = helpers._make_list_of_lists(data, index=False)
+        assert headers == [] and values == [['2016-01-01', None], [1, 'bar']]
+
     def test_value_error(self):
         wrong_data_type = dict(foo='bar')
         with pytest.raises(ValueError) as err:
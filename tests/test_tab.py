@@ -1,3 +1,5 @@
+import copy
+
 import apiclient
 import httplib2
 import pandas as pd
@@ -31,25 +33,24 @@ def test_init(mock_tab):
     assert repr(mock_tab).startswith(repr_start)
 
 
-def test_getattribute_for_non_method(mock_tab):
+def test_refresh_token_not_called_for_non_method(mock_tab):
     # Also make sure we actually get something back from the non-method call
     assert mock_tab.tabname == 'test_tab'
+    assert mock_tab.nrows == 1000
     # There will be 2 calls already because mock_tab is created from mock_workbook.fetch_tab()
     # and _refresh_token_if_needs is called in __init__(); verify it wasn't called again
     assert mock_tab.workbook.client._refresh_token_if_needed.call_count == 2
 
 
-def test_getattribute_for_private_method(mocker, mock_tab):
-    mocker.patch.object(mock_tab, '_process_rows')
-    mock_tab._process_rows()
+def test_refresh_token_not_called_for_private_method(mock_tab):
+    mock_tab._expand_to_fit('test_tab!A1:C10')
     # There will be 2 calls already because mock_tab is created from mock_workbook.fetch_tab()
     # and _refresh_token_if_needs is called in __init__(); verify it wasn't called again
     assert mock_tab.workbook.client._refresh_token_if_needed.call_count == 2
 
 
-def test_getattribute_for_user_facing_method_with_credentials(mocker, mock_tab):
-    mocker.patch.object(mock_tab, 'add_rows')
-    mock_tab.add_rows()
+def test_refresh_token_called_for_user_facing_method(mock_tab):
+    mock_tab.clear_data()
     # There will be 2 calls already because mock_tab is created from mock_workbook.fetch_tab()
     # and _refresh_token_if_needs is called in __init__(); verify it was called a third time
     assert mock_tab.workbook.client._refresh_token_if_needed.call_count == 3
@@ -106,15 +107,19 @@ def test_add_rows_or_columns(mocker, mock_tab):
                                                        autospec=True)
 
     mock_tab._add_rows_or_columns(kind='ROWS', n='1234')
+    mock_tab._add_rows_or_columns(kind='COLUMNS', n=4)
 
-    assert mocked_batch_update.call_count == 1
+    assert mocked_batch_update.call_count == 2
     _, call_args, _ = mocked_batch_update.mock_calls[0]
     requests = call_args[0]['requests']
     assert len(requests) == 1
     assert requests[0]['appendDimension'] == {'length': '1234',
                                               'sheetId': mock_tab.tab_id,
                                               'dimension': 'ROWS'}
-    mocked_update_tab_properties.assert_called_once_with()
+    # The cached dimensions are updated without fetching the tab properties again
+    assert mock_tab.nrows == 1000 + 1234
+    assert mock_tab.ncols == 26 + 4
+    assert mocked_update_tab_properties.call_count == 0
 
 
 def test_align_cells(mocker, mock_tab):
@@ -141,9 +146,11 @@ def test_alter_dimensions(mocker, mock_tab):
     assert len(requests) == 1
     properties = requests[0]['updateSheetProperties']['properties']
     assert properties['sheetId'] == mock_tab.tab_id
-    assert properties['gridProperties']['columnCount'] == mock_tab.ncols
+    assert properties['gridProperties']['columnCount'] == 26
     assert properties['gridProperties']['rowCount'] == 123
-    mocked_update_tab_properties.assert_called_once_with()
+    assert mock_tab.nrows == 123
+    assert mock_tab.ncols == 26
+    assert mocked_update_tab_properties.call_count == 0
 
 
 def test_autosize_columns(mocker, mock_tab):
@@ -194,6 +201,131 @@ def test_format_headers(mocker, mock_tab):
     properties = update_sheet['updateSheetProperties']['properties']
     assert properties['gridProperties']['frozenRowCount'] == 3
     assert properties['sheetId'] == mock_tab.tab_id
+    assert mock_tab.properties['gridProperties']['frozenRowCount'] == 3
+
+
+def test_autoformat(mocker, mock_tab):
+    mocked_batch_update = mocker.patch.object(mock_tab.workbook, 'batch_update', autospec=True)
+    mock_tab.sheets_svc.values().get().execute.return_value = {
+        'values': [['a', 'b', 'c'], [1, 2], [3, 4, 5]]
+    }
+
+    mock_tab.autoformat(n_header_rows=1)
+
+    # All stylings are sent in a single request, with the dimension trim applied last
+    assert mocked_batch_update.call_count == 1
+    _, call_args, _ = mocked_batch_update.mock_calls[0]
+    requests = call_args[0]['requests']
+    assert [list(request.keys())[0] for request in requests] == [
+        'repeatCell', 'updateSheetProperties', 'repeatCell', 'repeatCell',
+        'autoResizeDimensions', 'updateSheetProperties'
+    ]
+    assert requests[-1]['updateSheetProperties']['properties']['gridProperties'] == {
+        'rowCount': 3, 'columnCount': 3
+    }
+
+    assert mock_tab.nrows == 3
+    assert mock_tab.ncols == 3
+    assert mock_tab.properties['gridProperties']['frozenRowCount'] == 1
+
+
+def test_batched(mocker, mock_tab):
+    mocked_batch_update = mocker.patch.object(mock_tab.workbook, 'batch_update', autospec=True)
+
+    with mock_tab.batched() as tab:
+        tab.add_rows(10)
+        tab.align_cells()
+        with tab.batched():
+            tab.format_font(size=12)
+        assert mocked_batch_update.call_count == 0
+
+    # All of the changes are sent together, in order, once the outermost block exits
+    assert mocked_batch_update.call_count == 1
+    _, call_args, _ = mocked_batch_update.mock_calls[0]
+    requests = call_args[0]['requests']
+    assert [list(r) for r in requests] == [['appendDimension'], ['repeatCell'], ['repeatCell']]
+    # Requests built after add_rows() already account for the added rows
+    assert requests[1]['repeatCell']['range']['endRowIndex'] == 1010
+    assert mock_tab.nrows == 1010
+
+    # Outside of the block, changes are sent straight away again
+    mock_tab.autosize_columns()
+    assert mocked_batch_update.call_count == 2
+
+
+def _make_dimension_changes(tab):
+    tab.add_rows(10)
+    tab.add_columns(2)
+    tab.alter_dimensions(nrows=50, ncols=5)
+    tab.format_headers(2)
+    tab.align_cells()
+
+
+def _serve_tab_properties(tab, properties):
+    """ Have fetching the tab's properties return a copy of the given properties """
+    tab.sheets_svc.get().execute.return_value = {'sheets': [{'properties': copy.deepcopy(properties)}]}
+
+
+def test_batched_discards_changes_on_error(mocker, mock_tab):
+    mocked_batch_update = mocker.patch.object(mock_tab.workbook, 'batch_update', autospec=True)
+    original_properties = copy.deepcopy(mock_tab.properties)
+    _serve_tab_properties(mock_tab, original_properties)
+
+    with pytest.raises(ValueError):
+        with mock_tab.batched():
+            _make_dimension_changes(mock_tab)
+            raise ValueError('Something went wrong')
+
+    assert mocked_batch_update.call_count == 0
+    assert mock_tab._pending_requests is None
+    # The properties are fetched again, so later requests span the tab's actual dimensions
+    assert mock_tab.properties == original_properties
+    assert (mock_tab.nrows, mock_tab.ncols) == (1000, 26)
+    assert 'frozenRowCount' not in mock_tab.properties['gridProperties']
+
+
+def test_batched_refetches_properties_if_sending_fails(mocker, mock_tab):
+    mocked_batch_update = mocker.patch.object(mock_tab.workbook, 'batch_update', autospec=True,
+                                              side_effect=ValueError('Request failed'))
+    original_properties = copy.deepcopy(mock_tab.properties)
+    _serve_tab_properties(mock_tab, original_properties)
+
+    with pytest.raises(ValueError):
+        with mock_tab.batched():
+            _make_dimension_changes(mock_tab)
+
+    assert mocked_batch_update.call_count == 1
+    assert mock_tab._pending_requests is None
+    assert mock_tab.properties == original_properties
+    assert (mock_tab.nrows, mock_tab.ncols) == (1000, 26)
+
+    # Without failures the changes are kept
+    mocked_batch_update.side_effect = None
+    with mock_tab.batched():
+        _make_dimension_changes(mock_tab)
+    assert (mock_tab.nrows, mock_tab.ncols) == (50, 5)
+    assert mock_tab.properties['gridProperties']['frozenRowCount'] == 2
+
+
+def test_batched_keeps_growth_from_data_writes_on_error(mocker, mock_tab, expected_data):
+    mocker.patch.object(mock_tab, 'clear_data', autospec=True)
+    mocked_batch_update = mocker.patch.object(mock_tab.workbook, 'batch_update', autospec=True)
+    mock_tab.sheets_svc.values().update().execute.return_value = {
+        'updatedRange': 'test_tab!A1:AD1234'
+    }
+    # Writing the data grew the tab in Google Sheets, even though the formatting is discarded
+    grown_properties = copy.deepcopy(mock_tab.properties)
+    grown_properties['gridProperties'] = {'rowCount': 1234, 'columnCount': 30}
+    _serve_tab_properties(mock_tab, grown_properties)
+
+    with pytest.raises(ValueError):
+        with mock_tab.batched():
+            mock_tab.insert_data(expected_data, autoformat=False)
+            mock_tab.alter_dimensions(nrows=5, ncols=4)
+            raise ValueError('Something went wrong')
+
+    assert mocked_batch_update.call_count == 0
+    assert (mock_tab.nrows, mock_tab.ncols) == (1234, 30)
 
 
 def test_clear_data(mocker, mock_tab):
@@ -203,6 +335,16 @@ def test_clear_data(mocker, mock_tab):
     mock_tab.sheets_svc.values().clear().execute.assert_called_once_with()
 
 
+def test_values_svc_built_once(mocker, mock_tab):
+    mocked_values = mocker.patch.object(mock_tab.sheets_svc, 'values')
+
+    mock_tab.clear_data()
+    mock_tab.clear_data()
+
+    assert mocked_values.call_count == 1
+    assert mocked_values().clear().execute.call_count == 2
+
+
 def test_get_parent_workbook(mock_tab):
     parent = mock_tab.workbook
     assert parent == mock_tab._workbook
@@ -226,6 +368,24 @@ def test_process_rows_type_errors(mock_tab, expected_data):
     assert err.match('Mismatch exists in expected and actual data types')
 
 
+def test_process_rows_unconvertible_value(mock_tab):
+    """ A value that can't be converted is kept as-is without affecting others of its format """
+    number_format = {'numberFormat': {'type': 'NUMBER'}}
+    data = {
+        'sheets': [
+            {'data': [
+                {'rowData': [
+                    {'values': [{'effectiveValue': {'numberValue': 2},
+                                 'effectiveFormat': number_format}]},
+                    {'values': [{}, {'effectiveValue': {'stringValue': 'foo'},
+                                     'effectiveFormat': number_format}]},
+                ]}
+            ]}
+        ]
+    }
+    assert mock_tab._process_rows(data) == [[2.0], [None, 'foo']]
+
+
 def test_process_rows_cell_error_values(mock_tab):
     data = {
         'sheets': [
@@ -322,6 +482,27 @@ def test_fetch_data_dict_no_headers(mock_tab, expected_cleaned_data_no_headers):
     assert mock_tab.fetch_data(fmt='dict', headers=False) == expected
 
 
+def test_fetch_data_untyped(mock_tab):
+    mock_tab.sheets_svc.values().get().execute.return_value = {
+        'values': [['a', 'b', 'c'], [1, '', 43000.5], ['foo', True], [], ['']]
+    }
+
+    assert mock_tab.fetch_data(fmt='list', typed=False) == (
+        ['a', 'b', 'c'], [[1, None, 43000.5], ['foo', True, None]]
+    )
+    mock_tab.sheets_svc.values().get.assert_called_with(
+        spreadsheetId=mock_tab.workbook.file_id, range=mock_tab.tabname,
+        valueRenderOption='UNFORMATTED_VALUE', dateTimeRenderOption='SERIAL_NUMBER',
+        fields='values'
+    )
+
+
+def test_fetch_data_untyped_empty(mock_tab):
+    mock_tab.sheets_svc.values().get().execute.return_value = {}
+
+    assert mock_tab.fetch_data(typed=False).equals(pd.DataFrame([]))
+
+
 def test_insert_data(mocker, mock_tab, expected_data):
     mocker.patch.object(mock_tab, 'clear_data', autospec=True)
     mocked_update_tab_properties = mocker.patch.object(mock_tab, '_update_tab_properties',
@@ -335,6 +516,10 @@ def test_insert_data(mocker, mock_tab, expected_data):
         [None, None, None, None, None]
     ]
 
+    mock_tab.sheets_svc.values().update().execute.return_value = {
+        'updatedRange': 'test_tab!A1:E1234'
+    }
+
     mock_tab.insert_data(data=expected_data, autoformat=False)
 
     mock_tab.sheets_svc.values().update.assert_called_with(
@@ -343,7 +528,28 @@ def test_insert_data(mocker, mock_tab, expected_data):
         valueInputOption='USER_ENTERED',
         body={'values': transformed_data})
 
-    mocked_update_tab_properties.assert_called_once_with()
+    assert mocked_update_tab_properties.call_count == 0
+    assert mock_tab.nrows == 1234
+    assert mock_tab.ncols == 26
+
+
+def test_insert_data_autoformat(mocker, mock_tab, expected_data):
+    mocker.patch.object(mock_tab, 'clear_data', autospec=True)
+    mocked_batch_update = mocker.patch.object(mock_tab.workbook, 'batch_update', autospec=True)
+    mock_tab.sheets_svc.values().update().execute.return_value = {
+        'updatedRange': 'test_tab!A1:E6'
+    }
+
+    mock_tab.insert_data(data=expected_data, index=False)
+
+    # The populated cells are worked out from the inserted data rather than fetched
+    assert mock_tab.sheets_svc.values().get.call_count == 0
+    assert mocked_batch_update.call_count == 1
+    _, call_args, _ = mocked_batch_update.mock_calls[0]
+    grid_properties = call_args[0]['requests'][-1]['updateSheetProperties']['properties']
+    assert grid_properties['gridProperties'] == {'rowCount': 5, 'columnCount': 4}
+    assert mock_tab.nrows == 5
+    assert mock_tab.ncols == 4
 
 
 def test_append_data(mocker, mock_tab, expected_data):
@@ -359,6 +565,10 @@ def test_append_data(mocker, mock_tab, expected_data):
         [None, None, None, None, None]
     ]
 
+    mock_tab.sheets_svc.values().append().execute.return_value = {
+        'updates': {'updatedRange': "'test_tab'!A1001:AB1006"}
+    }
+
     mock_tab.append_data(data=expected_data, autoformat=False)
 
     mock_tab.sheets_svc.values().append.assert_called_with(
@@ -367,4 +577,13 @@ def test_append_data(mocker, mock_tab, expected_data):
         valueInputOption='USER_ENTERED',
         body={'values': transformed_data})
 
+    assert mocked_update_tab_properties.call_count == 0
+    assert mock_tab.nrows == 1006
+    assert mock_tab.ncols == 28
+
+
+def test_refresh(mocker, mock_tab):
+    mocked_update_tab_properties = mocker.patch.object(mock_tab, '_update_tab_properties',
+                                                       autospec=True)
+    mock_tab.refresh()
     mocked_update_tab_properties.assert_called_once_with()
@@ -1,3 +1,5 @@
+import threading
+
 import apiclient
 import httplib2
 import pandas as pd
@@ -6,22 +8,22 @@ import pytest
 import datasheets
 
 
-def test_getattribute_for_non_method(mock_workbook):
+def test_refresh_token_not_called_for_non_method(mock_workbook):
     # Also make sure we actually get something back from the non-method call
     assert mock_workbook.filename == 'datasheets_test_1'
     # _refresh_token_if_needs is called in __init__(); verify it wasn't called again
     assert mock_workbook.client._refresh_token_if_needed.call_count == 1
 
 
-def test_getattribute_for_private_method(mocker, mock_workbook):
-    mocker.patch.object(mock_workbook, '_fetch_permission_id')
-    mock_workbook._fetch_permission_id('test@test.test')
+def test_refresh_token_not_called_for_private_method(mocker, mock_workbook):
+    mocker.patch.object(mock_workbook, 'drive_svc', autospec=True)
+    mock_workbook._build_share_request('test@test.test', 'reader', True, None)
     # _refresh_token_if_needs is called in __init__(); verify it wasn't called again
     assert mock_workbook.client._refresh_token_if_needed.call_count == 1
 
 
-def test_getattribute_for_user_facing_method_with_credentials(mocker, mock_workbook):
-    mocker.patch.object(mock_workbook, 'share')
+def test_refresh_token_called_for_user_facing_method(mocker, mock_workbook):
+    mocker.patch.object(mock_workbook, 'drive_svc', autospec=True)
     mock_workbook.share('test@test.test')
     # _refresh_token_if_needs is called in __init__(); verify it was called a second time
     assert mock_workbook.client._refresh_token_if_needed.call_count == 2
@@ -53,34 +55,20 @@ def test_init(mocker, mock_client):
 def test_fetch_permission_id(mocker, mock_workbook):
     mocked_drive_svc = mocker.patch.object(mock_workbook, 'drive_svc', autospec=True)
     mocked_drive_svc.permissions().list().execute.return_value = {
-        'kind': 'drive#permissionList',
         'permissions': [
-            {'kind': 'drive#permission',
-             'id': '48004950760004877923',
-             'type': 'user',
-             'role': 'owner'},
-            {'kind': 'drive#permission',
-             'id': '15012643990489651114',
-             'type': 'user',
-             'role': 'reader'}
+            {'id': '48004950760004877923', 'emailAddress': 'wrong@email.test'},
+            {'id': '03311782613474716713'},
+            {'id': '15012643990489651114', 'emailAddress': 'get_permission_id@testdomain.test'},
         ]
     }
-    mocked_drive_svc.permissions().get().execute.side_effect = [
-        {'emailAddress': 'wrong@email.test'},
-        {'emailAddress': 'get_permission_id@testdomain.test'},
-    ]
 
     permission_id = mock_workbook._fetch_permission_id('get_permission_id@testdomain.test')
     assert permission_id == '15012643990489651114'
 
-    mocked_drive_svc.permissions().list.assert_any_call(fileId=mock_workbook.file_id)
-    mocked_drive_svc.permissions().get.assert_any_call(fileId=mock_workbook.file_id,
-                                                       permissionId='48004950760004877923',
-                                                       fields='emailAddress')
-    mocked_drive_svc.permissions().get.assert_any_call(fileId=mock_workbook.file_id,
-                                                       permissionId='15012643990489651114',
-                                                       fields='emailAddress')
-    assert mocked_drive_svc.permissions().get().execute.call_count == 2
+    mocked_drive_svc.permissions().list.assert_called_with(fileId=mock_workbook.file_id,
+                                                           fields='permissions(id,emailAddress)')
+    # Email addresses come with the list of permissions, so no permission is fetched on its own
+    assert mocked_drive_svc.permissions().get.call_count == 0
 
 
 def test_fetch_permission_id_nonexistent(mocker, mock_workbook):
@@ -90,7 +78,6 @@ def test_fetch_permission_id_nonexistent(mocker, mock_workbook):
     with pytest.raises(datasheets.exceptions.PermissionNotFound) as err:
         mock_workbook._fetch_permission_id('nonexistent@testdomain.test')
     err.match("Permission for email 'nonexistent@testdomain.test' not found for workbook 'datasheets_test_1'")
-    mocked_drive_svc.permissions().list.assert_any_call(fileId=mock_workbook.file_id)
 
 
 def test_share(mocker, mock_workbook):
@@ -107,20 +94,57 @@ def test_share(mocker, mock_workbook):
     assert kwargs['body']['emailAddress'] == email
 
 
+def test_share_many(mocker, mock_workbook):
+    mocked_drive_svc = mocker.patch.object(mock_workbook, 'drive_svc', autospec=True)
+    emails = ['email{}@testdomain.test'.format(i) for i in range(150)]
+    roles = ['reader', 'writer'] * 75
+
+    mock_workbook.share_many(emails, role=roles, notify=False, message='Hello')
+
+    # 150 permissions should be split across two batch requests
+    assert mocked_drive_svc.new_batch_http_request.call_count == 2
+    assert mocked_drive_svc.new_batch_http_request().add.call_count == 150
+    assert mocked_drive_svc.new_batch_http_request().execute.call_count == 2
+    create_calls = [c for c in mocked_drive_svc.permissions().create.mock_calls if c[2]]
+    assert [c[2]['body']['emailAddress'] for c in create_calls] == emails
+    assert [c[2]['body']['role'] for c in create_calls] == roles
+    assert all(c[2]['sendNotificationEmail'] is False for c in create_calls)
+    assert all(c[2]['emailMessage'] == 'Hello' for c in create_calls)
+
+
+def test_permissions_svc_built_once(mocker, mock_workbook):
+    mocked_permissions = mocker.patch.object(mock_workbook.drive_svc, 'permissions')
+
+    mock_workbook.share(email='first@testdomain.test')
+    mock_workbook.share(email='second@testdomain.test')
+
+    assert mocked_permissions.call_count == 1
+    assert mocked_permissions().create().execute.call_count == 2
+
+
+def test_share_many_raises_errors(mocker, mock_workbook):
+    mocked_drive_svc = mocker.patch.object(mock_workbook, 'drive_svc', autospec=True)
+    error = ValueError('Invalid email')
+    callbacks = []
+    batch = mocker.Mock()
+    batch.execute.side_effect = lambda: callbacks[0]('1', None, error)
+    mocked_drive_svc.new_batch_http_request.side_effect = \
+        lambda callback: callbacks.append(callback) or batch
+
+    with pytest.raises(ValueError) as err:
+        mock_workbook.share_many('bad_email', role='reader')
+    assert err.value is error
+
+
 def test_fetch_permissions(mocker, mock_workbook):
     mocked_drive_svc = mocker.patch.object(mock_workbook, 'drive_svc', autospec=True)
     mocked_drive_svc.permissions().list().execute.return_value = {
         'permissions': [
-            {'id': '12604950761524962923', 'type': 'user', 'role': 'owner'},
-            {'id': '13232714134634019830', 'type': 'group', 'role': 'writer'},
-            {'id': '13845842511136751920k', 'type': 'domain', 'role': 'commenter'},
+            {'type': 'user', 'role': 'owner', 'emailAddress': 'fetch_permission_id@testdomain.test'},
+            {'type': 'group', 'role': 'writer', 'emailAddress': 'some_group@testdomain.test'},
+            {'type': 'domain', 'role': 'commenter'},
         ]
     }
-    mocked_drive_svc.permissions().get().execute.side_effect = [
-        {'emailAddress': 'fetch_permission_id@testdomain.test'},
-        {'emailAddress': 'some_group@testdomain.test'},
-        {},
-    ]
 
     expected = pd.DataFrame([
         {'email': 'fetch_permission_id@testdomain.test', 'role': 'owner'},
@@ -129,10 +153,11 @@ def test_fetch_permissions(mocker, mock_workbook):
     ])
     output = mock_workbook.fetch_permissions()
     assert output.equals(expected)
+    assert mock_workbook.fetch_permissions(fmt='dict') == expected.to_dict('records')
 
-    mocked_drive_svc.permissions().list.assert_called_with(fileId=mock_workbook.file_id,
-                                                           fields='permissions(id,role,type)')
-    assert mocked_drive_svc.permissions().get().execute.call_count == 3
+    mocked_drive_svc.permissions().list.assert_called_with(
+        fileId=mock_workbook.file_id, fields='permissions(role,type,emailAddress)')
+    assert mocked_drive_svc.permissions().get.call_count == 0
 
 
 def test_unshare(mocker, mock_workbook):
@@ -160,20 +185,28 @@ def test_batch_update(mocker, mock_workbook):
                         }
                     }
     body = {'requests': [request_body]}
-    mock_workbook.batch_update(body=body)
+    response = mock_workbook.batch_update(body=body)
 
     mocked_sheets_svc.batchUpdate.assert_any_call(spreadsheetId=mock_workbook.file_id, body=body)
     mocked_sheets_svc.batchUpdate().execute.assert_called_once()
+    assert response is mocked_sheets_svc.batchUpdate().execute.return_value
 
 
 def test_create_tab(mocker, mock_workbook):
     filename = 'test_create_tab'
     mocked_batch_update = mocker.patch.object(mock_workbook, 'batch_update', autospec=True)
-    mocked_fetch_tab = mocker.patch.object(mock_workbook, 'fetch_tab')
+    mocked_sheets_svc = mocker.patch.object(mock_workbook, 'sheets_svc', autospec=True)
+    new_properties = {'sheetId': 1234, 'title': filename,
+                      'gridProperties': {'rowCount': 20, 'columnCount': 10}}
+    mocked_batch_update.return_value = {'replies': [{'addSheet': {'properties': new_properties}}]}
 
-    mock_workbook.create_tab(filename, nrows=20, ncols=10)
+    tab = mock_workbook.create_tab(filename, nrows=20, ncols=10)
 
-    mocked_fetch_tab.assert_any_call(filename)
+    # The new tab's properties are taken from the reply rather than fetched again
+    assert isinstance(tab, datasheets.Tab)
+    assert tab.properties == new_properties
+    assert tab.tab_id == 1234
+    assert mocked_sheets_svc.get.call_count == 0
     _, _, kwargs = mocked_batch_update.mock_calls[0]
     assert len(kwargs['body']['requests']) == 1
     properties = kwargs['body']['requests'][0]['addSheet']['properties']
@@ -182,31 +215,112 @@ def test_create_tab(mocker, mock_workbook):
 
 
 def test_delete_tab(mocker, mock_workbook):
-    mocked_fetch_tab = mocker.patch.object(mock_workbook, 'fetch_tab')
-    mocked_fetch_tab().tab_id = '1234'
+    mocked_fetch_tab_ids = mocker.patch.object(mock_workbook, '_fetch_tab_ids',
+                                               return_value={'test_delete_tab': '1234'})
     mocked_batch_update = mocker.patch.object(mock_workbook, 'batch_update')
 
     result = mock_workbook.delete_tab('test_delete_tab')
     assert result is None
 
-    mocked_fetch_tab.assert_any_call('test_delete_tab')
+    assert mocked_fetch_tab_ids.call_count == 1
     assert mocked_batch_update.call_count == 1
     _, _, kwargs = mocked_batch_update.mock_calls[0]
     assert kwargs['body']['requests'][0] == {'deleteSheet': {'sheetId': '1234'}}
 
 
+def test_delete_tab_refetches_tab_ids(mocker, mock_workbook):
+    mocked_sheets_svc = mocker.patch.object(mock_workbook, 'sheets_svc', autospec=True)
+    mocked_sheets_svc.get().execute.side_effect = [
+        {'sheets': [{'properties': {'title': 'Sheet1', 'sheetId': 0}},
+                    {'properties': {'title': 'old_tab', 'sheetId': 1234}}]},
+        # old_tab was deleted and recreated elsewhere after its ID was cached
+        {'sheets': [{'properties': {'title': 'Sheet1', 'sheetId': 0}},
+                    {'properties': {'title': 'old_tab', 'sheetId': 5678}}]},
+    ]
+    mocked_batch_update = mocker.patch.object(mock_workbook, 'batch_update')
+
+    assert mock_workbook._get_tab_id('old_tab') == 1234
+    mock_workbook.delete_tab('old_tab')
+
+    assert mocked_sheets_svc.get().execute.call_count == 2
+    _, _, kwargs = mocked_batch_update.mock_calls[0]
+    assert kwargs['body']['requests'][0] == {'deleteSheet': {'sheetId': 5678}}
+
+
+def test_get_tab_id(mocker, mock_workbook):
+    mocked_sheets_svc = mocker.patch.object(mock_workbook, 'sheets_svc', autospec=True)
+    mocked_sheets_svc.get().execute.side_effect = [
+        {'sheets': [{'properties': {'title': 'Sheet1', 'sheetId': 0}}]},
+        {'sheets': [{'properties': {'title': 'Sheet1', 'sheetId': 0}},
+                    {'properties': {'title': 'new_tab', 'sheetId': 1234}}]},
+        {'sheets': [{'properties': {'title': 'new_tab', 'sheetId': 1234}}]},
+    ]
+
+    assert mock_workbook._get_tab_id('Sheet1') == 0
+    assert mock_workbook._get_tab_id('Sheet1') == 0
+    assert mocked_sheets_svc.get().execute.call_count == 1
+
+    # Tab IDs are fetched again for tabs that aren't cached
+    assert mock_workbook._get_tab_id('new_tab') == 1234
+    assert mocked_sheets_svc.get().execute.call_count == 2
+
+    # ...and after any update to the workbook
+    mock_workbook.batch_update({'requests': []})
+    with pytest.raises(datasheets.exceptions.TabNotFound) as err:
+        mock_workbook._get_tab_id('Sheet1')
+    assert err.match("Tab 'Sheet1' could not be found in workbook 'datasheets_test_1'")
+    assert mocked_sheets_svc.get().execute.call_count == 3
+
+
+def test_replace_tab(mocker, mock_workbook):
+    mocker.patch.object(mock_workbook, '_fetch_tab_ids', return_value={'Sheet1': '1234'})
+    mocked_batch_update = mocker.patch.object(mock_workbook, 'batch_update')
+    new_properties = {'sheetId': 5678, 'title': 'new_tab',
+                      'gridProperties': {'rowCount': 20, 'columnCount': 10}}
+    mocked_batch_update.return_value = {
+        'replies': [{'addSheet': {'properties': new_properties}}, {}]
+    }
+
+    tab = mock_workbook._replace_tab('Sheet1', 'new_tab', nrows=20, ncols=10)
+
+    assert tab.tabname == 'new_tab'
+    assert tab.properties == new_properties
+    # Both changes are sent in one request, with the new tab added first
+    assert mocked_batch_update.call_count == 1
+    _, _, kwargs = mocked_batch_update.mock_calls[0]
+    add_request, delete_request = kwargs['body']['requests']
+    assert add_request['addSheet']['properties']['title'] == 'new_tab'
+    assert add_request['addSheet']['properties']['gridProperties'] == {'columnCount': 10,
+                                                                       'rowCount': 20}
+    assert delete_request == {'deleteSheet': {'sheetId': '1234'}}
+
+
 def test_fetch_tab_names(mocker, mock_workbook):
     mocked_sheets_svc = mocker.patch.object(mock_workbook, 'sheets_svc', autospec=True)
     mocked_sheets_svc.get().execute.return_value = {
         'sheets': [
-            {'properties': {'title': 'test_tab_1'}},
-            {'properties': {'title': 'test_tab_2'}},
-            {'properties': {'title': 'test_tab_3'}},
+            {'properties': {'title': 'test_tab_1', 'sheetId': 0}},
+            {'properties': {'title': 'test_tab_2', 'sheetId': 1504104867}},
+            {'properties': {'title': 'test_tab_3', 'sheetId': 7704104867}},
         ]
     }
 
     expected = pd.DataFrame(['test_tab_1', 'test_tab_2', 'test_tab_3'], columns=['Tabs'])
     assert mock_workbook.fetch_tab_names().equals(expected)
+    assert mock_workbook.fetch_tab_names(fmt='list') == ['test_tab_1', 'test_tab_2', 'test_tab_3']
+    # The tab IDs are cached along the way
+    assert mock_workbook._get_tab_id('test_tab_2') == 1504104867
+    mocked_sheets_svc.get.assert_called_with(spreadsheetId=mock_workbook.file_id,
+                                             fields='sheets/properties(sheetId,title)')
+    assert mocked_sheets_svc.get().execute.call_count == 2
+
+
+@pytest.mark.parametrize("method, accepted", [
+    ('fetch_tab_names', "'df' and 'list'"), ('fetch_permissions', "'df' and 'dict'")])
+def test_fetch_unexpected_fmt(mock_workbook, method, accepted):
+    with pytest.raises(ValueError) as err:
+        getattr(mock_workbook, method)(fmt='foo')
+    assert err.match("Unexpected value 'foo' for parameter `fmt`. Accepted values are " + accepted)
 
 
 def test_fetch_tab(mocker, mock_workbook):
@@ -229,6 +343,38 @@ def test_fetch_tab(mocker, mock_workbook):
     assert tab.workbook.filename == mock_workbook.filename
 
 
+def test_fetch_tabs_data(mocker, mock_workbook):
+    def make_tab(tabname, workbook, drive_svc, sheets_svc):
+        tab = mocker.Mock()
+        tab._fetch_data.side_effect = lambda headers, fmt, typed: (tabname, headers, fmt, typed)
+        return tab
+    mocked_tab = mocker.patch('datasheets.workbook.Tab', side_effect=make_tab)
+    refresh_count = mock_workbook.client._refresh_token_if_needed.call_count
+
+    tabnames = ['tab_{}'.format(i) for i in range(10)]
+    result = mock_workbook.fetch_tabs_data(tabnames, fmt='list', typed=False, max_workers=3)
+
+    assert result == [(tabname, True, 'list', False) for tabname in tabnames]
+    assert mocked_tab.call_count == 10
+    # The token is checked once up front rather than by each thread
+    assert mock_workbook.client._refresh_token_if_needed.call_count == refresh_count + 1
+    assert mock_workbook.fetch_tabs_data([]) == []
+
+
+def test_fetch_tabs_data_reuses_threads(mocker, mock_workbook):
+    mocked_tab = mocker.patch('datasheets.workbook.Tab')
+    thread_ids = set()
+    mocked_tab.return_value._fetch_data.side_effect = \
+        lambda **kwargs: thread_ids.add(threading.current_thread().ident)
+
+    for _ in range(3):
+        mock_workbook.fetch_tabs_data(['tab_1', 'tab_2'], max_workers=2)
+
+    # Later calls run on the same threads, which keep their HTTP connections open
+    assert len(thread_ids) <= 2
+    assert datasheets.workbook._get_thread_pool(2) is datasheets.workbook._get_thread_pool(2)
+
+
 def test_fetch_tab_not_found(mocker, mock_workbook):
     # Mock response generated by adding a pdb breakpoint in workbook.py to get a real error
     side_effect = apiclient.errors.HttpError(